@@ -1,22 +1,57 @@
 import asyncio
+import atexit
 import logging
+import sys
+import threading
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
 
-from swerex.deployment.hooks.abstract import DeploymentHook
-from swerex.runtime.abstract import AbstractRuntime, IsAliveResponse
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
-__all__ = ["AbstractDeployment"]
+    # Only needed for annotations. Importing the runtime models is comparatively slow
+    # and not needed to, e.g., parse a deployment config.
+    from swerex.deployment.hooks.abstract import DeploymentHook
+    from swerex.runtime.abstract import AbstractRuntime, IsAliveResponse
+
+__all__ = ["AbstractDeployment", "stop_all"]
+
+_STOP_TASKS: set[asyncio.Task] = set()
+"""Keeps references to the `stop` tasks started by `__del__` so that they are not garbage collected before they
+finish.
+"""
+
+_cleanup_loop: asyncio.AbstractEventLoop | None = None
+_cleanup_loop_lock = threading.Lock()
+
+
+def _get_cleanup_loop() -> asyncio.AbstractEventLoop:
+    """Returns an event loop running in a background thread. `__del__` uses it to stop deployments that are
+    deleted while no event loop is running. The thread is only started when it is first needed.
+    """
+    global _cleanup_loop
+    with _cleanup_loop_lock:
+        if _cleanup_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="swerex-deployment-cleanup", daemon=True).start()
+            atexit.register(loop.call_soon_threadsafe, loop.stop)
+            _cleanup_loop = loop
+    return _cleanup_loop
 
 
 class AbstractDeployment(ABC):
+    __slots__ = ("logger", "__weakref__")
+
+    _get_running_loop = staticmethod(asyncio.get_running_loop)
+
     def __init__(self, *args, **kwargs):
         self.logger: logging.Logger
 
     @abstractmethod
-    def add_hook(self, hook: DeploymentHook): ...
+    def add_hook(self, hook: "DeploymentHook"): ...
 
     @abstractmethod
-    async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
+    async def is_alive(self, *, timeout: float | None = None) -> "IsAliveResponse":
         """Checks if the runtime is alive. The return value can be
         tested with bool().
 
@@ -34,27 +69,54 @@ class AbstractDeployment(ABC):
 
     @property
     @abstractmethod
-    def runtime(self) -> AbstractRuntime:
+    def runtime(self) -> "AbstractRuntime":
         """Returns the runtime if running.
 
         Raises:
             DeploymentNotStartedError: If the deployment was not started.
         """
 
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
     def __del__(self):
-        """Stops the runtime when the object is deleted."""
-        # Need to be check whether we are in an async event loop or not
-        # https://stackoverflow.com/questions/54770360/
-        msg = "Ensuring deployment is stopped because object is deleted"
+        """Best-effort attempt to stop the runtime when the object is deleted.
+
+        Please use `async with deployment:` or call `await deployment.stop()` explicitly.
+        If no event loop is running, `stop` is scheduled on a background cleanup loop instead of starting a new loop
+        from the finalizer. `stop` must therefore not await resources that are bound to the loop the deployment was
+        used in; the `RemoteRuntime`, for example, drops its HTTP client instead of closing it from the cleanup loop.
+        """
+        if sys.is_finalizing():
+            return
+        # The logger is not set if __init__ failed
+        logger = getattr(self, "logger", None)
+        if logger is not None:
+            logger.debug("Ensuring deployment is stopped because object is deleted")
         try:
-            self.logger.debug(msg)
-        except Exception:
-            print(msg)
+            loop = self._get_running_loop()
+        except RuntimeError:
+            try:
+                asyncio.run_coroutine_threadsafe(self.stop(), _get_cleanup_loop())
+            except Exception:
+                pass
+            return
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(self.stop())
-            else:
-                loop.run_until_complete(self.stop())
+            task = loop.create_task(self.stop())
         except Exception:
-            pass
+            return
+        _STOP_TASKS.add(task)
+        task.add_done_callback(_STOP_TASKS.discard)
+
+
+async def stop_all(deployments: "Iterable[AbstractDeployment]") -> None:
+    """Stop several deployments concurrently. Errors from individual deployments are logged, not raised."""
+    deployments = list(deployments)
+    results = await asyncio.gather(*(d.stop() for d in deployments), return_exceptions=True)
+    for deployment, result in zip(deployments, results):
+        if isinstance(result, Exception):
+            deployment.logger.error("Failed to stop deployment", exc_info=result)
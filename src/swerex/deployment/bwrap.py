@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Self
 
@@ -8,19 +8,26 @@ from swerex.deployment.config import BwrapDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.bwrap import BwrapRuntime
-from swerex.utils.log import get_logger
+
+if TYPE_CHECKING:
+    from swerex.runtime.bwrap import BwrapRuntime
 
 __all__ = ["BwrapDeployment", "BwrapDeploymentConfig"]
 
+_NOT_STARTED_RESPONSE = IsAliveResponse(is_alive=False, message="Runtime is None.")
+
 
 class BwrapDeployment(AbstractDeployment):
+    __slots__ = ("_runtime", "_config", "_hooks")
+
     def __init__(
         self,
         *,
         logger: logging.Logger | None = None,
         **kwargs: Any,
     ):
+        from swerex.utils.log import get_logger
+
         self._runtime = None
         self.logger = logger or get_logger("rex-deploy")
         self._config = BwrapDeploymentConfig(**kwargs)
@@ -35,11 +42,13 @@ class BwrapDeployment(AbstractDeployment):
 
     async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
         if self._runtime is None:
-            return IsAliveResponse(is_alive=False, message="Runtime is None.")
+            return _NOT_STARTED_RESPONSE
         return await self._runtime.is_alive(timeout=timeout)
 
     async def start(self):
         """Starts the runtime."""
+        from swerex.runtime.bwrap import BwrapRuntime
+
         self._runtime = BwrapRuntime(logger=self.logger)
 
     async def stop(self):
@@ -48,7 +57,7 @@ class BwrapDeployment(AbstractDeployment):
             self._runtime = None
 
     @property
-    def runtime(self) -> BwrapRuntime:
+    def runtime(self) -> "BwrapRuntime":
         if self._runtime is None:
             raise DeploymentNotStartedError()
         return self._runtime
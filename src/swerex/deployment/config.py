@@ -1,9 +1,13 @@
+import functools
+import importlib
+from collections.abc import Callable
 from pathlib import PurePath
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Annotated, Any, Literal
 
-from pydantic import BaseModel, ConfigDict, model_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, model_validator
 
-from swerex.deployment.abstract import AbstractDeployment
+if TYPE_CHECKING:
+    from swerex.deployment.abstract import AbstractDeployment
 
 
 class LocalDeploymentConfig(BaseModel):
@@ -12,12 +16,10 @@ class LocalDeploymentConfig(BaseModel):
     type: Literal["local"] = "local"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.local import LocalDeployment
-
-        return LocalDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class BwrapDeploymentConfig(BaseModel):
@@ -26,12 +28,10 @@ class BwrapDeploymentConfig(BaseModel):
     type: Literal["bwrap"] = "bwrap"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
-
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.bwrap import BwrapDeployment
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-        return BwrapDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class DockerDeploymentConfig(BaseModel):
@@ -40,7 +40,7 @@ class DockerDeploymentConfig(BaseModel):
     image: str = "python:3.11"
     """The name of the docker image to use."""
     port: int | None = None
-    """The port that the docker container connects to. If None, a free port is found."""
+    """The port that the docker container connects to. If None, docker picks a free port."""
     docker_args: list[str] = []
     """Additional arguments to pass to the docker run command. If --platform is specified here, it will be moved to the platform field."""
     startup_timeout: float = 180.0
@@ -54,46 +54,53 @@ class DockerDeploymentConfig(BaseModel):
     platform: str | None = None
     """The platform to use for the docker image."""
     remove_container: bool = True
-    """Whether to remove the container after it has stopped."""
+    """Whether to remove the container after it has stopped. Docker removes it automatically when it exits
+    (`docker run --rm`), also if `stop` is never called. Set to False to keep the container (and its output)
+    for inspection; it is then only killed by `stop`.
+    """
+    cache_swerex_install: bool = False
+    """If the image does not contain swe-rex, it is installed with pipx every time the container starts.
+    With this option, the container is committed to a new image after the installation, so that later
+    deployments of the same image start right away. Ignored if `python_standalone_dir` is set or `pull` is `always`.
+    """
 
     type: Literal["docker"] = "docker"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
     @model_validator(mode="before")
     def validate_platform_args(cls, data: dict) -> dict:
         if not isinstance(data, dict):
             return data
 
-        docker_args = data.get("docker_args", [])
-        platform = data.get("platform")
-
-        platform_arg_idx = next((i for i, arg in enumerate(docker_args) if arg.startswith("--platform")), -1)
-
-        if platform_arg_idx != -1:
-            if platform is not None:
+        docker_args = data.get("docker_args")
+        if not docker_args:
+            return data
+        for idx, arg in enumerate(docker_args):
+            # Comparing a slice is cheaper than calling startswith for the many arguments that don't match
+            if arg[:10] != "--platform" or (len(arg) > 10 and arg[10] != "="):
+                continue
+            if data.get("platform") is not None:
                 msg = "Cannot specify platform both via 'platform' field and '--platform' in docker_args"
                 raise ValueError(msg)
-            # Extract platform value from --platform argument
-            if "=" in docker_args[platform_arg_idx]:
+            if arg != "--platform":
                 # Handle case where platform is specified as --platform=value
-                data["platform"] = docker_args[platform_arg_idx].split("=", 1)[1]
-                data["docker_args"] = docker_args[:platform_arg_idx] + docker_args[platform_arg_idx + 1 :]
-            elif platform_arg_idx + 1 < len(docker_args):
-                data["platform"] = docker_args[platform_arg_idx + 1]
-                # Remove the --platform and its value from docker_args
-                data["docker_args"] = docker_args[:platform_arg_idx] + docker_args[platform_arg_idx + 2 :]
+                data["platform"] = arg[11:]
+                n_removed = 1
+            elif idx + 1 < len(docker_args):
+                data["platform"] = docker_args[idx + 1]
+                n_removed = 2
             else:
                 msg = "--platform argument must be followed by a value"
                 raise ValueError(msg)
-
+            # Remove the --platform argument (and its value) from docker_args in a single copy
+            data["docker_args"] = docker_args[:idx] + docker_args[idx + n_removed :]
+            break
         return data
 
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.docker import DockerDeployment
-
-        return DockerDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class ModalDeploymentConfig(BaseModel):
@@ -128,12 +135,10 @@ class ModalDeploymentConfig(BaseModel):
     installing pipx might fail (or be slow).
     """
 
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.modal import ModalDeployment
-
-        return ModalDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class FargateDeploymentConfig(BaseModel):
@@ -153,12 +158,10 @@ class FargateDeploymentConfig(BaseModel):
     type: Literal["fargate"] = "fargate"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
-
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.fargate import FargateDeployment
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-        return FargateDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class RemoteDeploymentConfig(BaseModel):
@@ -169,7 +172,7 @@ class RemoteDeploymentConfig(BaseModel):
     auth_token: str
     """The token to use for authentication."""
     host: str = "http://127.0.0.1"
-    """The host to connect to."""
+    """The host to connect to. Use `unix:///path/to/socket` for a server started with `--uds`."""
     port: int | None = None
     """The port to connect to."""
     timeout: float = 0.15
@@ -177,12 +180,10 @@ class RemoteDeploymentConfig(BaseModel):
     type: Literal["remote"] = "remote"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.remote import RemoteDeployment
-
-        return RemoteDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
 class DummyDeploymentConfig(BaseModel):
@@ -191,27 +192,60 @@ class DummyDeploymentConfig(BaseModel):
     type: Literal["dummy"] = "dummy"
     """Discriminator for (de)serialization/CLI. Do not change."""
 
-    model_config = ConfigDict(extra="forbid")
-
-    def get_deployment(self) -> AbstractDeployment:
-        from swerex.deployment.dummy import DummyDeployment
+    model_config = ConfigDict(extra="forbid", frozen=True, defer_build=True)
 
-        return DummyDeployment.from_config(self)
+    def get_deployment(self) -> "AbstractDeployment":
+        return get_deployment(self)
 
 
-DeploymentConfig = (
+DeploymentConfig = Annotated[
     LocalDeploymentConfig
     | DockerDeploymentConfig
     | ModalDeploymentConfig
     | FargateDeploymentConfig
     | RemoteDeploymentConfig
     | DummyDeploymentConfig
-    | BwrapDeploymentConfig
-)
-"""Union of all deployment configurations. Useful for type hints."""
+    | BwrapDeploymentConfig,
+    Field(discriminator="type"),
+]
+"""Union of all deployment configurations. Useful for type hints.
+Pydantic uses the `type` field to pick the configuration class when validating.
+"""
+
+
+@functools.cache
+def _get_deployment_config_adapter() -> TypeAdapter:
+    """Built on first use and then reused, because building the validator for the union is comparatively slow."""
+    return TypeAdapter(DeploymentConfig)
+
+
+def parse_deployment_config(data: Any) -> DeploymentConfig:
+    """Validate a deployment configuration (e.g., a dict loaded from a file).
+    The `type` field selects the configuration class.
+    """
+    return _get_deployment_config_adapter().validate_python(data)
+
+
+_DEPLOYMENT_CLASSES: dict[str, Callable[[], "type[AbstractDeployment]"]] = {
+    "local": lambda: importlib.import_module("swerex.deployment.local").LocalDeployment,
+    "docker": lambda: importlib.import_module("swerex.deployment.docker").DockerDeployment,
+    "modal": lambda: importlib.import_module("swerex.deployment.modal").ModalDeployment,
+    "fargate": lambda: importlib.import_module("swerex.deployment.fargate").FargateDeployment,
+    "remote": lambda: importlib.import_module("swerex.deployment.remote").RemoteDeployment,
+    "dummy": lambda: importlib.import_module("swerex.deployment.dummy").DummyDeployment,
+    "bwrap": lambda: importlib.import_module("swerex.deployment.bwrap").BwrapDeployment,
+}
+"""Maps the `type` discriminator of a config to a function that imports and returns the deployment class.
+Deployment modules are only imported when they are used, because some of them import heavy optional dependencies.
+"""
+
+
+@functools.cache
+def _get_deployment_class(config_type: str) -> "type[AbstractDeployment]":
+    return _DEPLOYMENT_CLASSES[config_type]()
 
 
 def get_deployment(
     config: DeploymentConfig,
-) -> AbstractDeployment:
-    return config.get_deployment()
+) -> "AbstractDeployment":
+    return _get_deployment_class(config.type).from_config(config)
@@ -1,48 +1,450 @@
+import asyncio
+import collections
+import functools
+import hashlib
+import itertools
+import json
 import logging
+import os
+import re
+import secrets
 import shlex
+import string
 import subprocess
+import tempfile
 import time
-import uuid
-from typing import Any
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote
 
+import httpx
 from typing_extensions import Self
 
-from swerex import PACKAGE_NAME, REMOTE_EXECUTABLE_NAME
+from swerex import PACKAGE_NAME, REMOTE_EXECUTABLE_NAME, __version__
 from swerex.deployment.abstract import AbstractDeployment
 from swerex.deployment.config import DockerDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError, DockerPullError
-from swerex.runtime.abstract import IsAliveResponse
+from swerex.runtime.abstract import Command, IsAliveResponse
 from swerex.runtime.config import RemoteRuntimeConfig
-from swerex.runtime.remote import RemoteRuntime
-from swerex.utils.free_port import find_free_port
 from swerex.utils.log import get_logger
 from swerex.utils.wait import _wait_until_alive
 
+if TYPE_CHECKING:
+    from swerex.runtime.remote import RemoteRuntime
+
 __all__ = ["DockerDeployment", "DockerDeploymentConfig"]
 
 
-def _is_image_available(image: str) -> bool:
+@functools.cache
+def _get_docker_socket() -> str | None:
+    """Returns the path to the socket of the docker daemon if we can be sure that the `docker` CLI talks to the
+    same daemon. Otherwise (e.g., a remote `DOCKER_HOST` or a non-default docker context), returns None.
+    """
+    docker_host = os.environ.get("DOCKER_HOST")
+    if docker_host:
+        if not docker_host.startswith("unix://"):
+            return None
+        socket_path = docker_host.removeprefix("unix://")
+    else:
+        if os.environ.get("DOCKER_CONTEXT", "default") != "default":
+            return None
+        config_path = Path(os.environ.get("DOCKER_CONFIG", Path.home() / ".docker")) / "config.json"
+        try:
+            current_context = json.loads(config_path.read_text()).get("currentContext")
+        except (OSError, ValueError, AttributeError):
+            current_context = None
+        if current_context not in (None, "", "default"):
+            return None
+        socket_path = "/var/run/docker.sock"
+    if not Path(socket_path).exists():
+        return None
+    return socket_path
+
+
+async def _docker_api_request(
+    method: str,
+    path: str,
+    *,
+    timeout: float | None = 30,
+    params: dict[str, str] | None = None,
+    body: Any = None,
+) -> httpx.Response | None:
+    """Sends a request to the docker engine API. Returns None if the API is not reachable, in which case
+    the caller should fall back to the `docker` CLI.
+    """
+    socket_path = _get_docker_socket()
+    if socket_path is None:
+        return None
+    transport = httpx.AsyncHTTPTransport(uds=socket_path)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://docker", timeout=timeout) as client:
+            return await client.request(method, path, params=params, json=body)
+    except httpx.HTTPError:
+        return None
+
+
+async def _run_docker_command(
+    *args: str, timeout: float | None = None, input: bytes | None = None, env: dict[str, str] | None = None
+) -> bytes:
+    """Runs `docker` with the given arguments and returns its stdout.
+
+    Raises:
+        subprocess.CalledProcessError: If the command has a non-zero exit code
+        subprocess.TimeoutExpired: If the command does not finish within `timeout` seconds
+    """
+    cmd = ["docker", *args]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout) from None  # type: ignore[arg-type]
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)  # type: ignore[arg-type]
+    return stdout
+
+
+_IMAGE_AVAILABLE_TTL = 30.0
+"""How long (in seconds) we trust the result of checking whether an image is available locally."""
+_image_available_cache: dict[str, tuple[float, bool]] = {}
+_image_available_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _get_cached_image_available(image: str) -> bool | None:
+    cached = _image_available_cache.get(image)
+    if cached is None or time.monotonic() - cached[0] >= _IMAGE_AVAILABLE_TTL:
+        return None
+    return cached[1]
+
+
+async def _is_image_available(image: str) -> bool:
+    """Checks whether the image is available locally. Results are cached for `_IMAGE_AVAILABLE_TTL` seconds and
+    concurrent checks of the same image only inspect it once.
+    """
+    if (available := _get_cached_image_available(image)) is not None:
+        return available
+    lock = _image_available_locks.get(image)
+    if lock is None:
+        lock = asyncio.Lock()
+        _image_available_locks[image] = lock
+    async with lock:
+        if (available := _get_cached_image_available(image)) is not None:
+            return available
+        available = await _inspect_image(image)
+        _image_available_cache[image] = (time.monotonic(), available)
+    return available
+
+
+async def _inspect_image(image: str) -> bool:
+    response = await _docker_api_request("GET", f"/images/{quote(image, safe='/:')}/json")
+    if response is not None and response.status_code in (200, 404):
+        return response.status_code == 200
     try:
-        subprocess.check_call(["docker", "inspect", image], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        await _run_docker_command("inspect", image)
         return True
     except subprocess.CalledProcessError:
         return False
 
 
-def _pull_image(image: str) -> bytes:
+MAX_CONCURRENT_IMAGE_OPERATIONS = 8
+"""Maximum number of concurrent `docker pull`/`docker build` commands (per event loop), so that starting many
+deployments at once does not overwhelm the docker daemon.
+"""
+_image_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_image_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _image_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_IMAGE_OPERATIONS)
+        _image_semaphores[loop] = semaphore
+    return semaphore
+
+
+_pull_image_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def _pull_image(image: str) -> None:
+    """Pulls the image. If the same image is already being pulled, waits for that pull instead of starting
+    another one.
+
+    Raises:
+        subprocess.CalledProcessError: If the pull failed (`stderr` contains the error message as bytes)
+    """
+    lock = _pull_image_locks.get(image)
+    if lock is None:
+        lock = asyncio.Lock()
+        _pull_image_locks[image] = lock
+    waited = lock.locked()
+    async with lock:
+        if waited and _get_cached_image_available(image):
+            # Pulled by whoever held the lock
+            return
+        async with _get_image_semaphore():
+            await _run_docker_command("pull", image)
+        _image_available_cache[image] = (time.monotonic(), True)
+
+
+_CONTAINER_NAME_INVALID_CHARS = re.compile(r"[^a-zA-Z0-9_.-]")
+
+
+@functools.cache
+def _sanitize_image_name(image: str) -> str:
+    """Removes all characters that are not allowed in container names."""
+    return _CONTAINER_NAME_INVALID_CHARS.sub("", image)
+
+
+_container_name_counter = itertools.count()
+
+_builder_image_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _get_build_env() -> dict[str, str]:
+    """Environment for `docker build`: BuildKit reuses cached layers across builds."""
+    return {**os.environ, "DOCKER_BUILDKIT": "1"}
+
+
+async def _remove_image(image: str) -> None:
+    _image_available_cache.pop(image, None)
+    response = await _docker_api_request("DELETE", f"/images/{quote(image, safe='/:')}")
+    if response is not None and response.status_code == 200:
+        return
+    await _run_docker_command("rmi", image, timeout=30)
+
+
+_STANDALONE_PYTHON_BUILDER_DOCKERFILE = string.Template(
+    "FROM $platform_arg python:3.11-slim\n"
+    # Install build dependencies
+    "RUN apt-get update && apt-get install -y \\\n"
+    "    wget \\\n"
+    "    gcc \\\n"
+    "    make \\\n"
+    "    zlib1g-dev \\\n"
+    "    libssl-dev \\\n"
+    "    && rm -rf /var/lib/apt/lists/*\n\n"
+    # Download and compile Python as standalone
+    "WORKDIR /build\n"
+    "RUN wget https://www.python.org/ftp/python/3.11.8/Python-3.11.8.tgz \\\n"
+    "    && tar xzf Python-3.11.8.tgz\n"
+    "WORKDIR /build/Python-3.11.8\n"
+    "RUN ./configure \\\n"
+    "    --prefix=/root/python3.11 \\\n"
+    "    --enable-shared \\\n"
+    "    LDFLAGS='-Wl,-rpath=/root/python3.11/lib' && \\\n"
+    "    make -j$$(nproc) && \\\n"
+    "    make install && \\\n"
+    "    ldconfig\n"
+)
+
+_GLIBC_DOCKERFILE = string.Template(
+    "ARG BASE_IMAGE\n\n"
+    # The standalone Python is compiled in a separate image that is shared by all base images
+    "FROM $platform_arg $builder_tag AS builder\n\n"
+    # Production stage
+    "FROM $platform_arg $$BASE_IMAGE\n"
+    # Ensure we have the required runtime libraries
+    "RUN apt-get update && apt-get install -y \\\n"
+    "    libc6 \\\n"
+    "    && rm -rf /var/lib/apt/lists/*\n"
+    # Copy the standalone Python installation
+    "COPY --from=builder /root/python3.11 $python_standalone_dir/python3.11\n"
+    "ENV LD_LIBRARY_PATH=$python_standalone_dir/python3.11/lib:$${LD_LIBRARY_PATH:-}\n"
+    # Verify installation
+    "RUN $python_standalone_dir/python3.11/bin/python3 --version\n"
+    # Install swe-rex using the standalone Python
+    "RUN /root/python3.11/bin/pip3 install --no-cache-dir $package\n\n"
+    "RUN ln -s /root/python3.11/bin/$executable /usr/local/bin/$executable\n\n"
+    "RUN $executable --version\n"
+)
+
+
+@functools.cache
+def _get_standalone_python_builder_dockerfile(platform_arg: str) -> str:
+    return _STANDALONE_PYTHON_BUILDER_DOCKERFILE.substitute(platform_arg=platform_arg)
+
+
+@functools.cache
+def _get_standalone_python_builder_tag(platform_arg: str) -> str:
+    digest = hashlib.sha256(_get_standalone_python_builder_dockerfile(platform_arg).encode()).hexdigest()[:12]
+    return f"swerex-python-standalone:3.11.8-{digest}"
+
+
+@functools.cache
+def _get_glibc_dockerfile(platform_arg: str, python_standalone_dir: str) -> str:
+    return _GLIBC_DOCKERFILE.substitute(
+        platform_arg=platform_arg,
+        builder_tag=_get_standalone_python_builder_tag(platform_arg),
+        python_standalone_dir=python_standalone_dir,
+        package=PACKAGE_NAME,
+        executable=REMOTE_EXECUTABLE_NAME,
+    )
+
+
+_WARM_IMAGE_REPOSITORY = "swerex-warm"
+"""Repository of the images that are committed from containers in which swe-rex was installed on startup."""
+
+
+def _get_warm_image_tag(image_id: str) -> str:
+    """Returns the tag of the image with swe-rex installed that is committed from containers of the image with
+    ID `image_id`. The tag depends on the ID rather than on the name of the image, so that we don't use a stale
+    warm image after the image was pulled or built again under the same name.
+    """
+    digest = hashlib.sha256(image_id.encode()).hexdigest()[:12]
+    return f"{_WARM_IMAGE_REPOSITORY}:{digest}-{__version__}"
+
+
+async def _get_image_id(image: str) -> str | None:
+    """Returns the ID of the local image, or None if it is not available."""
+    response = await _docker_api_request("GET", f"/images/{quote(image, safe='/:')}/json")
+    if response is not None and response.status_code in (200, 404):
+        return response.json()["Id"] if response.status_code == 200 else None
+    try:
+        output = await _run_docker_command("image", "inspect", "--format", "{{.Id}}", image, timeout=10)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+    return output.decode().strip() or None
+
+
+async def _get_container_state(container: str) -> dict[str, Any] | None:
+    """Returns the `State` of the container (as in `docker inspect`) or None if there is no such container."""
+    response = await _docker_api_request("GET", f"/containers/{quote(container, safe='')}/json")
+    if response is not None and response.status_code in (200, 404):
+        return response.json()["State"] if response.status_code == 200 else None
+    try:
+        output = await _run_docker_command("container", "inspect", "--format", "{{json .State}}", container, timeout=10)
+    except subprocess.CalledProcessError:
+        return None
+    return json.loads(output)
+
+
+async def _run_container_via_api(
+    name: str, image: str, cmd: list[str], port: int | None, platform: str | None, *, auto_remove: bool
+) -> str | None:
+    """Creates and starts a container like `docker run -d -p <port>:8000` through the engine API, saving the fork
+    and exec of the `docker` CLI. Returns the container ID, or None if the caller should fall back to the CLI
+    (e.g., because the API is not reachable or the image is missing, which the CLI would pull).
+
+    Raises:
+        RuntimeError: If the container was created but could not be started
+    """
+    params = {"name": name}
+    if platform is not None:
+        params["platform"] = platform
+    config = {
+        "Image": image,
+        "Cmd": cmd,
+        "ExposedPorts": {"8000/tcp": {}},
+        "HostConfig": {"PortBindings": {"8000/tcp": [{"HostPort": str(port or "")}]}, "AutoRemove": auto_remove},
+    }
+    response = await _docker_api_request("POST", "/containers/create", params=params, body=config)
+    if response is None or response.status_code != 201:
+        return None
+    container_id = response.json()["Id"]
+    response = await _docker_api_request("POST", f"/containers/{container_id}/start")
+    if response is None or response.status_code not in (204, 304):
+        await _docker_api_request("DELETE", f"/containers/{container_id}", params={"force": "true"})
+        msg = f"Failed to start container: {response.text if response is not None else 'docker API not reachable'}"
+        raise RuntimeError(msg)
+    return container_id
+
+
+async def _wait_for_container_exit(container: str) -> int | None:
+    """Waits until the container exits and returns its exit code, or None if the container no longer exists
+    (e.g., because it exited and was removed automatically before we started waiting).
+    """
+    response = await _docker_api_request("POST", f"/containers/{quote(container, safe='')}/wait", timeout=None)
+    if response is not None and response.status_code in (200, 404):
+        return response.json()["StatusCode"] if response.status_code == 200 else None
+    try:
+        return int((await _run_docker_command("wait", container)).decode().strip())
+    except subprocess.CalledProcessError:
+        if await _get_container_state(container) is None:
+            return None
+        raise
+
+
+_SERVER_STARTED_MESSAGE = b"Uvicorn running on"
+"""Logged by the server once it accepts connections."""
+
+
+async def _wait_for_server_started(container: str, output: "collections.deque[bytes]") -> None:
+    """Follows the output of the container until the server reports that it accepts connections. Also returns
+    if the output ends without that message (e.g., because the container exited).
+    The lines are appended to `output`, so that we can still show them if the container exits and is removed.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "docker",
+        "logs",
+        "--follow",
+        container,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
     try:
-        return subprocess.check_output(["docker", "pull", image], stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        # e.stderr contains the error message as bytes
-        raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output, e.stderr) from None
+        async for line in process.stdout:  # type: ignore[union-attr]
+            output.append(line)
+            if _SERVER_STARTED_MESSAGE in line:
+                return
+    finally:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
 
 
-def _remove_image(image: str) -> bytes:
-    return subprocess.check_output(["docker", "rmi", image], timeout=30)
+_CONTAINER_LOG_LINES = 200
+"""Number of lines of container output that are included in error messages."""
+
+
+async def _get_container_logs(container: str) -> str:
+    """Returns the last `_CONTAINER_LOG_LINES` lines of the (interleaved) stdout and stderr of the container."""
+    process = await asyncio.create_subprocess_exec(
+        "docker",
+        "logs",
+        "--tail",
+        str(_CONTAINER_LOG_LINES),
+        container,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return "<timed out getting container logs>"
+    return output.decode(errors="replace")
 
 
 class DockerDeployment(AbstractDeployment):
+    __slots__ = (
+        "_config",
+        "_runtime",
+        "_image_id",
+        "_warm_image_tag",
+        "_container_name",
+        "_container_id",
+        "_runtime_timeout",
+        "_hooks",
+    )
+
     def __init__(
         self,
         *,
@@ -54,10 +456,19 @@ class DockerDeployment(AbstractDeployment):
         Args:
             **kwargs: Keyword arguments (see `DockerDeploymentConfig` for details).
         """
-        self._config = DockerDeploymentConfig(**kwargs)
+        self._post_init(DockerDeploymentConfig(**kwargs), logger=logger)
+
+    def _post_init(self, config: DockerDeploymentConfig, *, logger: logging.Logger | None = None) -> None:
+        self._config = config
         self._runtime: RemoteRuntime | None = None
-        self._container_process = None
+        self._image_id: str | None = None
+        """Image that the container is run from, set by `prepare`."""
+        self._warm_image_tag: str | None = None
+        """Tag of the image with swe-rex installed for the current version of the image (see
+        `cache_swerex_install`), set by `prepare`.
+        """
         self._container_name = None
+        self._container_id: str | None = None
         self.logger = logger or get_logger("rex-deploy")
         self._runtime_timeout = 0.15
         self._hooks = CombinedDeploymentHook()
@@ -67,12 +478,18 @@ class DockerDeployment(AbstractDeployment):
 
     @classmethod
     def from_config(cls, config: DockerDeploymentConfig) -> Self:
-        return cls(**config.model_dump())
+        """Creates a deployment from an already validated config. Unlike `DockerDeployment(**kwargs)`, this
+        neither dumps nor re-validates the config (it is frozen, so all deployments can share it).
+        """
+        self = cls.__new__(cls)
+        self._post_init(config)
+        return self
 
     def _get_container_name(self) -> str:
         """Returns a unique container name based on the image name."""
-        image_name_sanitized = "".join(c for c in self._config.image if c.isalnum() or c in "-_.")
-        return f"{image_name_sanitized}-{uuid.uuid4()}"
+        # Unique without needing random bytes: the counter is unique within the process, the pid and time across
+        # processes
+        return f"{_sanitize_image_name(self._config.image)}-{os.getpid()}-{next(_container_name_counter)}-{time.time_ns():x}"
 
     @property
     def container_name(self) -> str | None:
@@ -88,36 +505,99 @@ class DockerDeployment(AbstractDeployment):
         if self._runtime is None:
             msg = "Runtime not started"
             raise RuntimeError(msg)
-        if self._container_process is None:
-            msg = "Container process not started"
+        if self._container_id is None:
+            msg = "Container not started"
             raise RuntimeError(msg)
-        if self._container_process.poll() is not None:
-            msg = "Container process terminated."
-            output = "stdout:\n" + self._container_process.stdout.read().decode()  # type: ignore
-            output += "\nstderr:\n" + self._container_process.stderr.read().decode()  # type: ignore
-            msg += "\n" + output
+        response = await self._runtime.is_alive(timeout=timeout, use_cache=False)
+        if not response:
+            # Only ask docker about the container if the runtime does not respond
+            await self._raise_if_container_stopped()
+        return response
+
+    async def _raise_if_container_stopped(self) -> None:
+        assert self._container_id is not None
+        state = await _get_container_state(self._container_id)
+        if state is not None and state.get("Running"):
+            return
+        if state is None:
+            msg = (
+                f"Container {self._container_name} terminated and was removed. "
+                "Set `remove_container=False` to keep it (and its output) for inspection."
+            )
             raise RuntimeError(msg)
-        return await self._runtime.is_alive(timeout=timeout)
+        msg = f"Container terminated (exit code: {state.get('ExitCode')})."
+        msg += f"\nOutput:\n{await _get_container_logs(self._container_id)}"
+        raise RuntimeError(msg)
+
+    async def _get_output(self, startup_output: "collections.deque[bytes]", watcher: asyncio.Task) -> str:
+        """Returns the output of the container, or the output that `watcher` saw while the container started if
+        the container was already removed.
+        """
+        assert self._container_id is not None
+        if await _get_container_state(self._container_id) is not None:
+            return await _get_container_logs(self._container_id)
+        # The output ends when the container exits, so the watcher finishes reading it shortly
+        await asyncio.wait({watcher}, timeout=5)
+        return b"".join(startup_output).decode(errors="replace")
 
     async def _wait_until_alive(self, timeout: float = 10.0):
+        """Waits until the runtime responds. Meanwhile, we follow the container output to try again as soon as the
+        server is up, and wait for the container to exit, so that we can fail right away if it does (e.g., because
+        the image has no python), rather than only after `timeout`.
+        """
+        assert self._runtime is not None
+        assert self._container_id is not None
+        server_started = asyncio.Event()
+        startup_output: collections.deque[bytes] = collections.deque(maxlen=_CONTAINER_LOG_LINES)
+        started_task = asyncio.create_task(_wait_for_server_started(self._container_id, startup_output))
+        started_task.add_done_callback(lambda _: server_started.set())
+        # Rather than polling quickly, we try again as soon as the server reports that it is up. The polling
+        # is only a fallback in case we miss that message.
+        alive_task = asyncio.create_task(
+            _wait_until_alive(
+                self._runtime.is_alive,
+                timeout=timeout,
+                function_timeout=self._runtime_timeout,
+                sleep=1.0,
+                wake=server_started,
+            )
+        )
+        exit_task = asyncio.create_task(_wait_for_container_exit(self._container_id))
         try:
-            return await _wait_until_alive(self.is_alive, timeout=timeout, function_timeout=self._runtime_timeout)
+            done, _ = await asyncio.wait({alive_task, exit_task}, return_when=asyncio.FIRST_COMPLETED)
+            if exit_task in done and exit_task.exception() is None:
+                exit_code = exit_task.result()
+                msg = f"Container terminated (exit code: {'unknown' if exit_code is None else exit_code})."
+                msg += f"\nOutput:\n{await self._get_output(startup_output, started_task)}"
+                raise RuntimeError(msg)
+            # If we could not wait for the container, we still notice that it terminated once we time out
+            return await alive_task
         except TimeoutError as e:
-            self.logger.error("Runtime did not start within timeout. Here's the output from the container process.")
-            self.logger.error(self._container_process.stdout.read().decode())  # type: ignore
-            self.logger.error(self._container_process.stderr.read().decode())  # type: ignore
-            assert self._container_process is not None
+            self.logger.error("Runtime did not start within timeout. Here's the output from the container.")
+            self.logger.error(await self._get_output(startup_output, started_task))
             await self.stop()
             raise e
+        except RuntimeError:
+            # The container terminated
+            await self.stop()
+            raise
+        finally:
+            for task in (started_task, alive_task, exit_task):
+                task.cancel()
+            await asyncio.gather(started_task, alive_task, exit_task, return_exceptions=True)
 
     def _get_token(self) -> str:
-        return str(uuid.uuid4())
+        # Hex rather than urlsafe, because a token starting with "-" would be parsed as an option
+        return secrets.token_hex(16)
 
-    def _get_swerex_start_cmd(self, token: str) -> list[str]:
+    def _get_swerex_start_cmd(self, token: str, *, warm_image: bool = False) -> list[str]:
         rex_args = f"--auth-token {token}"
         pipx_install = "python3 -m pip install pipx && python3 -m pipx ensurepath"
         if self._config.python_standalone_dir:
             cmd = f"{self._config.python_standalone_dir}/python3.11/bin/{REMOTE_EXECUTABLE_NAME} {rex_args}"
+        elif warm_image:
+            # pipx and its cached environment for swe-rex are already part of the image
+            cmd = f"python3 -m pipx run {PACKAGE_NAME} {rex_args}"
         else:
             cmd = f"{REMOTE_EXECUTABLE_NAME} {rex_args} || ({pipx_install} && pipx run {PACKAGE_NAME} {rex_args})"
         # Need to wrap with /bin/sh -c to avoid having '&&' interpreted by the parent shell
@@ -128,189 +608,289 @@ class DockerDeployment(AbstractDeployment):
             cmd,
         ]
 
-    def _pull_image(self) -> None:
+    async def _pull_image(self) -> None:
         if self._config.pull == "never":
             return
-        if self._config.pull == "missing" and _is_image_available(self._config.image):
+        if self._config.pull == "missing" and await _is_image_available(self._config.image):
             return
         self.logger.info(f"Pulling image {self._config.image!r}")
         self._hooks.on_custom_step("Pulling docker image")
         try:
-            _pull_image(self._config.image)
+            await _pull_image(self._config.image)
         except subprocess.CalledProcessError as e:
             msg = f"Failed to pull image {self._config.image}. "
             msg += f"Error: {e.stderr.decode()}"
             msg += f"Output: {e.output.decode()}"
             raise DockerPullError(msg) from e
 
+    def _get_platform_arg(self) -> str:
+        if self._config.platform:
+            return f"--platform={self._config.platform}"
+        return ""
+
+    @property
+    def standalone_python_builder_dockerfile(self) -> str:
+        """Dockerfile of the image that compiles the standalone python. It does not depend on the base image,
+        so it only has to be built once per platform.
+        """
+        return _get_standalone_python_builder_dockerfile(self._get_platform_arg())
+
+    @property
+    def standalone_python_builder_tag(self) -> str:
+        """Tag of the builder image. Contains a hash of its Dockerfile, so that changes to it are picked up."""
+        return _get_standalone_python_builder_tag(self._get_platform_arg())
+
     @property
     def glibc_dockerfile(self) -> str:
         # will only work with glibc-based systems
-        if self._config.platform:
-            platform_arg = f"--platform={self._config.platform}"
-        else:
-            platform_arg = ""
-        return (
-            "ARG BASE_IMAGE\n\n"
-            # Build stage for standalone Python
-            f"FROM {platform_arg} python:3.11-slim AS builder\n"
-            # Install build dependencies
-            "RUN apt-get update && apt-get install -y \\\n"
-            "    wget \\\n"
-            "    gcc \\\n"
-            "    make \\\n"
-            "    zlib1g-dev \\\n"
-            "    libssl-dev \\\n"
-            "    && rm -rf /var/lib/apt/lists/*\n\n"
-            # Download and compile Python as standalone
-            "WORKDIR /build\n"
-            "RUN wget https://www.python.org/ftp/python/3.11.8/Python-3.11.8.tgz \\\n"
-            "    && tar xzf Python-3.11.8.tgz\n"
-            "WORKDIR /build/Python-3.11.8\n"
-            "RUN ./configure \\\n"
-            "    --prefix=/root/python3.11 \\\n"
-            "    --enable-shared \\\n"
-            "    LDFLAGS='-Wl,-rpath=/root/python3.11/lib' && \\\n"
-            "    make -j$(nproc) && \\\n"
-            "    make install && \\\n"
-            "    ldconfig\n\n"
-            # Production stage
-            f"FROM {platform_arg} $BASE_IMAGE\n"
-            # Ensure we have the required runtime libraries
-            "RUN apt-get update && apt-get install -y \\\n"
-            "    libc6 \\\n"
-            "    && rm -rf /var/lib/apt/lists/*\n"
-            # Copy the standalone Python installation
-            f"COPY --from=builder /root/python3.11 {self._config.python_standalone_dir}/python3.11\n"
-            f"ENV LD_LIBRARY_PATH={self._config.python_standalone_dir}/python3.11/lib:${{LD_LIBRARY_PATH:-}}\n"
-            # Verify installation
-            f"RUN {self._config.python_standalone_dir}/python3.11/bin/python3 --version\n"
-            # Install swe-rex using the standalone Python
-            f"RUN /root/python3.11/bin/pip3 install --no-cache-dir {PACKAGE_NAME}\n\n"
-            f"RUN ln -s /root/python3.11/bin/{REMOTE_EXECUTABLE_NAME} /usr/local/bin/{REMOTE_EXECUTABLE_NAME}\n\n"
-            f"RUN {REMOTE_EXECUTABLE_NAME} --version\n"
-        )
+        return _get_glibc_dockerfile(self._get_platform_arg(), self._config.python_standalone_dir)  # type: ignore[arg-type]
+
+    async def _build_standalone_python_builder(self) -> None:
+        """Builds the image that compiles the standalone python unless it already exists."""
+        tag = self.standalone_python_builder_tag
+        lock = _builder_image_locks.get(tag)
+        if lock is None:
+            lock = asyncio.Lock()
+            _builder_image_locks[tag] = lock
+        async with lock:
+            if await _is_image_available(tag):
+                return
+            self.logger.info(f"Building image {tag} that compiles the standalone python. This only happens once.")
+            platform_arg = []
+            if self._config.platform:
+                platform_arg = ["--platform", self._config.platform]
+            async with _get_image_semaphore():
+                await _run_docker_command(
+                    "build",
+                    "-q",
+                    *platform_arg,
+                    "-t",
+                    tag,
+                    "-",
+                    input=self.standalone_python_builder_dockerfile.encode(),
+                    env=_get_build_env(),
+                )
+            _image_available_cache[tag] = (time.monotonic(), True)
 
-    def _build_image(self) -> str:
+    async def _build_image(self) -> str:
         """Builds image, returns image ID."""
         self.logger.info(
             f"Building image {self._config.image} to install a standalone python to {self._config.python_standalone_dir}. "
             "This might take a while (but you only have to do it once). To skip this step, set `python_standalone_dir` to None."
         )
+        await self._build_standalone_python_builder()
         dockerfile = self.glibc_dockerfile
         platform_arg = []
         if self._config.platform:
             platform_arg = ["--platform", self._config.platform]
-        build_cmd = [
-            "docker",
-            "build",
-            "-q",
-            *platform_arg,
-            "--build-arg",
-            f"BASE_IMAGE={self._config.image}",
-            "-",
-        ]
-        image_id = (
-            subprocess.check_output(
-                build_cmd,
-                input=dockerfile.encode(),
-            )
-            .decode()
-            .strip()
-        )
+        async with _get_image_semaphore():
+            with tempfile.TemporaryDirectory() as tmpdir:
+                iidfile = Path(tmpdir) / "iid"
+                await _run_docker_command(
+                    "build",
+                    "-q",
+                    *platform_arg,
+                    "--build-arg",
+                    f"BASE_IMAGE={self._config.image}",
+                    "--iidfile",
+                    str(iidfile),
+                    "-",
+                    input=dockerfile.encode(),
+                    env=_get_build_env(),
+                )
+                image_id = iidfile.read_text().strip() if iidfile.exists() else ""
         if not image_id.startswith("sha256:"):
             msg = f"Failed to build image. Image ID is not a SHA256: {image_id}"
             raise RuntimeError(msg)
         return image_id
 
-    async def start(self):
-        """Starts the runtime."""
-        self._pull_image()
+    def _should_cache_swerex_install(self) -> bool:
+        return (
+            self._config.cache_swerex_install
+            and not self._config.python_standalone_dir
+            and self._config.pull != "always"
+        )
+
+    async def _cache_swerex_install(self) -> None:
+        """Commits the container to a new image if swe-rex had to be installed with pipx on startup."""
+        assert self._runtime is not None
+        response = await self._runtime.execute(Command(command=f"command -v {REMOTE_EXECUTABLE_NAME}", shell=True))
+        if response.exit_code == 0:
+            # swe-rex is part of the image, nothing to cache
+            return
+        tag = self._warm_image_tag
+        if tag is None:
+            # We could not determine the ID of the image
+            return
+        self.logger.info(f"Committing container {self._container_name} to {tag} to skip installing swe-rex next time")
+        try:
+            await _run_docker_command("commit", self._container_name, tag)  # type: ignore[arg-type]
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            self.logger.warning(f"Failed to commit container {self._container_name}", exc_info=True)
+            return
+        _image_available_cache[tag] = (time.monotonic(), True)
+
+    async def _get_host_port(self) -> int:
+        """Returns the host port that docker mapped to port 8000 of the container."""
+        assert self._container_id is not None
+        response = await _docker_api_request("GET", f"/containers/{self._container_id}/json")
+        if response is not None and response.status_code == 200:
+            return int(response.json()["NetworkSettings"]["Ports"]["8000/tcp"][0]["HostPort"])
+        output = await _run_docker_command("port", self._container_id, "8000/tcp", timeout=10)
+        # e.g., "0.0.0.0:32768\n[::]:32768"
+        return int(output.decode().partition("\n")[0].rpartition(":")[2])
+
+    async def prepare(self) -> None:
+        """Pulls (and, with `python_standalone_dir`, builds) the image, so that `start` only has to start the
+        container. Calling this is optional (`start` prepares the image if needed), but it lets you download
+        images ahead of time, e.g., while other deployments are still running.
+        """
+        if self._image_id is not None:
+            return
         if self._config.python_standalone_dir:
-            image_id = self._build_image()
+            # `docker build` pulls the base image itself if it is missing, so we only need to pull explicitly
+            # to refresh it
+            if self._config.pull == "always":
+                await self._pull_image()
+            image_id = await self._build_image()
         else:
+            await self._pull_image()
             image_id = self._config.image
-        if self._config.port is None:
-            self._config.port = find_free_port()
+        if self._should_cache_swerex_install():
+            base_image_id = await _get_image_id(self._config.image)
+            self._warm_image_tag = _get_warm_image_tag(base_image_id) if base_image_id is not None else None
+            if self._warm_image_tag is not None and await _is_image_available(self._warm_image_tag):
+                image_id = self._warm_image_tag
+        self._image_id = image_id
+
+    async def start(self):
+        """Starts the runtime.
+
+        Pulling and building images does not block the event loop, so many deployments can be started
+        concurrently with `asyncio.gather(*(d.start() for d in deployments))`.
+        """
+        from swerex.runtime.remote import RemoteRuntime
+
+        await self.prepare()
+        image_id = self._image_id
+        assert image_id is not None
+        warm_image = image_id == self._warm_image_tag
         assert self._container_name is None
         self._container_name = self._get_container_name()
         token = self._get_token()
         platform_arg = []
         if self._config.platform is not None:
             platform_arg = ["--platform", self._config.platform]
-        rm_arg = []
-        if self._config.remove_container:
-            rm_arg = ["--rm"]
-        cmds = [
-            "docker",
+        start_cmd = self._get_swerex_start_cmd(token, warm_image=warm_image)
+        # Run detached, so that we do not need to keep a `docker run` process (and its pipes) around for every
+        # container. With `--rm`, docker removes the container when it exits, even if `stop` is never called.
+        # We keep the output that we see while the container starts, in case it is removed right away.
+        args = [
             "run",
-            *rm_arg,
+            "-d",
+            *(["--rm"] if self._config.remove_container else []),
             "-p",
-            f"{self._config.port}:8000",
+            # With port 0, docker picks a free port itself (and there is no race with other processes)
+            f"{self._config.port or 0}:8000",
             *platform_arg,
             *self._config.docker_args,
             "--name",
             self._container_name,
             image_id,
-            *self._get_swerex_start_cmd(token),
+            *start_cmd,
         ]
-        cmd_str = shlex.join(cmds)
         self.logger.info(
-            f"Starting container {self._container_name} with image {self._config.image} serving on port {self._config.port}"
+            f"Starting container {self._container_name} with image {self._config.image} serving on port "
+            f"{self._config.port or '(chosen by docker)'}"
         )
-        self.logger.debug(f"Command: {cmd_str!r}")
-        # shell=True required for && etc.
-        self._container_process = subprocess.Popen(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Command: {shlex.join(['docker', *args])!r}")
+        t0 = time.time()
+        if not self._config.docker_args:
+            # Arbitrary `docker_args` cannot be translated to the API
+            try:
+                self._container_id = await _run_container_via_api(
+                    self._container_name,
+                    image_id,
+                    start_cmd,
+                    self._config.port,
+                    self._config.platform,
+                    auto_remove=self._config.remove_container,
+                )
+            except RuntimeError:
+                self._container_name = None
+                raise
+        if self._container_id is None:
+            try:
+                self._container_id = (await _run_docker_command(*args)).decode().strip()
+            except subprocess.CalledProcessError as e:
+                self._container_name = None
+                msg = f"Failed to start container: {e.stderr.decode(errors='replace')}"
+                raise RuntimeError(msg) from e
+        if self._config.port is None:
+            try:
+                port = await self._get_host_port()
+            except Exception:
+                try:
+                    await self._raise_if_container_stopped()
+                finally:
+                    await self.stop()
+                raise
+            self._config = self._config.model_copy(update={"port": port})
         self._hooks.on_custom_step("Starting runtime")
         self.logger.info(f"Starting runtime at {self._config.port}")
         self._runtime = RemoteRuntime.from_config(
             RemoteRuntimeConfig(port=self._config.port, timeout=self._runtime_timeout, auth_token=token)
         )
-        t0 = time.time()
-        await self._wait_until_alive(timeout=self._config.startup_timeout)
+        await self._wait_until_alive(timeout=self._config.startup_timeout - (time.time() - t0))
         self.logger.info(f"Runtime started in {time.time() - t0:.2f}s")
+        if self._should_cache_swerex_install() and not warm_image:
+            await self._cache_swerex_install()
 
     async def stop(self):
         """Stops the runtime."""
         if self._runtime is not None:
-            await self._runtime.close()
+            try:
+                await self._runtime.close()
+            except Exception as e:
+                # E.g., the container already exited. We still need to remove it below.
+                self.logger.warning(f"Failed to close runtime of container {self._container_name}: {e}")
             self._runtime = None
 
-        if self._container_process is not None:
-            try:
-                subprocess.check_call(
-                    ["docker", "kill", self._container_name],  # type: ignore
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    timeout=10,
-                )
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                self.logger.warning(
-                    f"Failed to kill container {self._container_name}: {e}. Will try harder.", exc_info=False
+        if self._container_id is not None:
+            # `rm -f` kills and removes the container in one go
+            if self._config.remove_container:
+                response = await _docker_api_request(
+                    "DELETE", f"/containers/{self._container_id}", params={"force": "true"}
                 )
-            for _ in range(3):
-                self._container_process.kill()
-                try:
-                    self._container_process.wait(timeout=5)
-                    break
-                except subprocess.TimeoutExpired:
-                    continue
+                args = ["rm", "-f"]
             else:
-                self.logger.warning(f"Failed to kill container {self._container_name} with SIGKILL")
-
-            self._container_process = None
-            self._container_name = None
+                response = await _docker_api_request("POST", f"/containers/{self._container_id}/kill")
+                args = ["kill"]
+            # 404: The container exited and was already removed
+            if response is None or response.status_code not in (204, 404):
+                try:
+                    await _run_docker_command(*args, self._container_id, timeout=10)
+                except subprocess.CalledProcessError as e:
+                    if b"No such container" not in e.stderr:
+                        self.logger.warning(f"Failed to stop container {self._container_name}: {e}", exc_info=False)
+                except subprocess.TimeoutExpired as e:
+                    self.logger.warning(f"Failed to stop container {self._container_name}: {e}", exc_info=False)
+            self._container_id = None
+        self._container_name = None
 
         if self._config.remove_images:
-            if _is_image_available(self._config.image):
+            self._image_id = None
+            self._warm_image_tag = None
+            if await _is_image_available(self._config.image):
                 self.logger.info(f"Removing image {self._config.image}")
                 try:
-                    _remove_image(self._config.image)
-                except subprocess.CalledProcessError:
+                    await _remove_image(self._config.image)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
                     self.logger.error(f"Failed to remove image {self._config.image}", exc_info=True)
 
     @property
-    def runtime(self) -> RemoteRuntime:
+    def runtime(self) -> "RemoteRuntime":
         """Returns the runtime if running.
 
         Raises:
@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Self
 
@@ -7,11 +7,17 @@ from swerex.deployment.abstract import AbstractDeployment
 from swerex.deployment.config import DummyDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.dummy import DummyRuntime
-from swerex.utils.log import get_logger
+
+if TYPE_CHECKING:
+    from swerex.runtime.dummy import DummyRuntime
+
+
+_IS_ALIVE_RESPONSE = IsAliveResponse(is_alive=True)
 
 
 class DummyDeployment(AbstractDeployment):
+    __slots__ = ("_config", "_runtime", "_hooks")
+
     def __init__(self, *, logger: logging.Logger | None = None, **kwargs: Any):
         """This deployment returns blank or predefined outputs.
         Useful for testing.
@@ -19,6 +25,9 @@ class DummyDeployment(AbstractDeployment):
         Args:
             **kwargs: Keyword arguments (see `DummyDeploymentConfig` for details).
         """
+        from swerex.runtime.dummy import DummyRuntime
+        from swerex.utils.log import get_logger
+
         self._config = DummyDeploymentConfig(**kwargs)
         self.logger = logger or get_logger("rex-deploy")
         self._runtime = DummyRuntime(logger=self.logger)  # type: ignore
@@ -32,7 +41,7 @@ class DummyDeployment(AbstractDeployment):
         return cls(**config.model_dump())
 
     async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
-        return IsAliveResponse(is_alive=True)
+        return _IS_ALIVE_RESPONSE
 
     async def start(self):
         pass
@@ -41,9 +50,9 @@ class DummyDeployment(AbstractDeployment):
         pass
 
     @property
-    def runtime(self) -> DummyRuntime:
+    def runtime(self) -> "DummyRuntime":
         return self._runtime
 
     @runtime.setter
-    def runtime(self, runtime: DummyRuntime):
+    def runtime(self, runtime: "DummyRuntime"):
         self._runtime = runtime
@@ -1,9 +1,13 @@
+import asyncio
+import concurrent.futures
 import logging
+import threading
 import time
 import uuid
-from typing import Any
+import weakref
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
-import boto3
 from typing_extensions import Self
 
 from swerex import PACKAGE_NAME, REMOTE_EXECUTABLE_NAME
@@ -12,23 +16,212 @@ from swerex.deployment.config import FargateDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.remote import RemoteRuntime
 from swerex.utils.aws import (
+    get_client,
     get_cloudwatch_log_url,
     get_cluster_arn,
     get_container_name,
     get_default_vpc_and_subnet,
     get_execution_role_arn,
-    get_public_ip,
     get_security_group,
     get_task_definition,
+    get_task_network_interface_id,
+    get_task_public_ip,
     run_fargate_task,
 )
 from swerex.utils.log import get_logger
 from swerex.utils.wait import _wait_until_alive
 
+if TYPE_CHECKING:
+    from swerex.runtime.remote import RemoteRuntime
+
+
+_init_aws_lock = threading.Lock()
+"""The AWS resources are looked up (or created) once per process. When many deployments start at the same time,
+all but the first wait for it instead of creating the same resources concurrently.
+"""
+
+_TASK_POLL_INTERVAL = 1.0
+"""Seconds between two `describe_tasks` calls while tasks are starting."""
+_TASK_DESCRIBE_WINDOW = 0.2
+"""Seconds that a one-off `describe` waits for other requests to describe them together."""
+_TASK_DESCRIBE_TIMEOUT = 30.0
+"""Seconds that `is_alive` waits for the status of the task."""
+_PUBLIC_IP_TIMEOUT = 5.0
+"""Seconds that we wait for the early public IP lookup once the task is running. The network interface should
+be attached by then, so this only matters if its attachment is reported unexpectedly.
+"""
+_DESCRIBE_TASKS_MAX_TASKS = 100
+"""ECS describes at most this many tasks per call."""
+_TASK_START_TIMEOUT = 600.0
+"""Seconds that a task may take to start (same as the default `tasks_running` waiter)."""
+
+
+def _is_running(task: dict) -> bool:
+    return task["lastStatus"] == "RUNNING"
+
+
+def _has_network_interface(task: dict) -> bool:
+    return get_task_network_interface_id(task) is not None
+
+
+class _TaskDescriber:
+    """Describes many Fargate tasks with one `describe_tasks` call per cluster (and per 100 tasks), rather than
+    one call per task. This keeps us below the ECS rate limits when many deployments start or are checked at
+    the same time.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, dict[str, list[tuple[asyncio.Future[dict], Callable[[dict], bool] | None]]]] = {}
+        """Cluster ARN -> task ARN -> futures that receive the `describe_tasks` entry of the task and the
+        condition that the entry must meet first (None for one-off requests)
+        """
+        self._poll_task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+
+    async def describe(self, cluster_arn: str, task_arn: str) -> dict:
+        """Returns the `describe_tasks` entry of the task.
+
+        Raises:
+            RuntimeError: If the task could not be described
+        """
+        return await self._request(cluster_arn, task_arn, None)
+
+    async def wait_until(self, cluster_arn: str, task_arn: str, condition: Callable[[dict], bool]) -> dict:
+        """Returns the `describe_tasks` entry of the task once `condition` is true for it.
+
+        Raises:
+            RuntimeError: If the task stopped before meeting the condition or could not be described
+        """
+        return await self._request(cluster_arn, task_arn, condition)
+
+    async def _request(self, cluster_arn: str, task_arn: str, condition: Callable[[dict], bool] | None) -> dict:
+        future: asyncio.Future[dict] = asyncio.get_running_loop().create_future()
+        entry = (future, condition)
+        entries = self._pending.setdefault(cluster_arn, {}).setdefault(task_arn, [])
+        entries.append(entry)
+        if condition is None:
+            # Don't let one-off requests wait for the full poll interval
+            self._wake.set()
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll())
+        try:
+            return await future
+        finally:
+            entries.remove(entry)
+            cluster_pending = self._pending.get(cluster_arn, {})
+            if not entries and cluster_pending.get(task_arn) is entries:
+                del cluster_pending[task_arn]
+                if not cluster_pending:
+                    del self._pending[cluster_arn]
+
+    async def _poll(self) -> None:
+        try:
+            await self._poll_until_done()
+        except asyncio.CancelledError:
+            self._cancel_pending()
+            raise
+        except Exception as e:
+            msg = f"Failed to describe ECS tasks: {e}"
+            self._fail_pending(RuntimeError(msg), cause=e)
+        # Nothing else resolves the futures once we return, so never leave any behind
+        self._fail_pending(RuntimeError("Stopped describing ECS tasks"))
+
+    def _cancel_pending(self) -> None:
+        for cluster_pending in self._pending.values():
+            for entries in cluster_pending.values():
+                for future, _ in entries:
+                    future.cancel()
+
+    def _fail_pending(self, e: Exception, *, cause: Exception | None = None) -> None:
+        if cause is not None:
+            e.__cause__ = cause
+        for cluster_pending in self._pending.values():
+            for entries in cluster_pending.values():
+                for future, _ in entries:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _poll_until_done(self) -> None:
+        ecs_client = get_client("ecs")
+        while self._pending:
+            # Collect requests that come in shortly after each other
+            await asyncio.sleep(_TASK_DESCRIBE_WINDOW)
+            self._wake.clear()
+            for cluster_arn, cluster_pending in list(self._pending.items()):
+                task_arns = list(cluster_pending)
+                for i in range(0, len(task_arns), _DESCRIBE_TASKS_MAX_TASKS):
+                    chunk = task_arns[i : i + _DESCRIBE_TASKS_MAX_TASKS]
+                    try:
+                        response = await asyncio.to_thread(ecs_client.describe_tasks, cluster=cluster_arn, tasks=chunk)
+                    except Exception as e:
+                        for task_arn in chunk:
+                            self._set_exception(cluster_pending, task_arn, e)
+                        continue
+                    for failure in response["failures"]:
+                        msg = f"Failed to describe task {failure.get('arn')}: {failure.get('reason')}"
+                        self._set_exception(cluster_pending, failure.get("arn"), RuntimeError(msg))
+                    for task in response["tasks"]:
+                        self._set_task(cluster_pending, task)
+            if not self._pending:
+                break
+            try:
+                await asyncio.wait_for(self._wake.wait(), _TASK_POLL_INTERVAL - _TASK_DESCRIBE_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _set_task(
+        cluster_pending: dict[str, list[tuple[asyncio.Future[dict], Callable[[dict], bool] | None]]], task: dict
+    ) -> None:
+        for future, condition in cluster_pending.get(task["taskArn"], []):
+            if future.done():
+                continue
+            if condition is None or condition(task):
+                future.set_result(task)
+            elif task["lastStatus"] == "STOPPED":
+                msg = f"Task {task['taskArn']} stopped before it was running: {task.get('stoppedReason')}"
+                future.set_exception(RuntimeError(msg))
+
+    @staticmethod
+    def _set_exception(
+        cluster_pending: dict[str, list[tuple[asyncio.Future[dict], Callable[[dict], bool] | None]]],
+        task_arn: str,
+        e: Exception,
+    ) -> None:
+        for future, _ in cluster_pending.get(task_arn, []):
+            if not future.done():
+                future.set_exception(e)
+
+
+_task_describers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _TaskDescriber]" = weakref.WeakKeyDictionary()
+"""Futures and tasks are bound to an event loop, so we keep one describer per loop."""
+
+
+def _get_task_describer() -> _TaskDescriber:
+    loop = asyncio.get_running_loop()
+    describer = _task_describers.get(loop)
+    if describer is None:
+        describer = _task_describers[loop] = _TaskDescriber()
+    return describer
+
 
 class FargateDeployment(AbstractDeployment):
+    __slots__ = (
+        "_config",
+        "_runtime",
+        "_container_process",
+        "_container_name",
+        "_hooks",
+        "_cluster_arn",
+        "_execution_role_arn",
+        "_vpc_id",
+        "_subnet_id",
+        "_security_group_id",
+        "_task_definition",
+        "_task_arn",
+    )
+
     def __init__(
         self,
         *,
@@ -57,22 +250,40 @@ class FargateDeployment(AbstractDeployment):
         return cls(**config.model_dump())
 
     def _init_aws(self):
-        self._cluster_arn = get_cluster_arn(self._config.cluster_name)
-        self._execution_role_arn = get_execution_role_arn(execution_role_prefix=self._config.execution_role_prefix)
-        self._task_definition = get_task_definition(
+        with _init_aws_lock:
+            self._init_aws_resources()
+
+    def _init_aws_resources(self):
+        # The lookups form three independent chains (the task definition needs the execution role, the security
+        # group needs the VPC), so we run the chains concurrently. Each lookup is a blocking boto3 call.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            cluster_future = executor.submit(get_cluster_arn, self._config.cluster_name)
+            task_definition_future = executor.submit(self._init_task_definition)
+            network_future = executor.submit(self._init_network)
+            self._cluster_arn = cluster_future.result()
+            self._execution_role_arn, self._task_definition = task_definition_future.result()
+            self._vpc_id, self._subnet_id, self._security_group_id = network_future.result()
+        self._container_name = get_container_name(self._config.image)
+
+    def _init_task_definition(self) -> tuple[str, dict]:
+        execution_role_arn = get_execution_role_arn(execution_role_prefix=self._config.execution_role_prefix)
+        task_definition = get_task_definition(
             image_name=self._config.image,
             port=self._config.port,
-            execution_role_arn=self._execution_role_arn,
+            execution_role_arn=execution_role_arn,
             task_definition_prefix=self._config.task_definition_prefix,
             log_group=self._config.log_group,
         )
-        self._vpc_id, self._subnet_id = get_default_vpc_and_subnet()
-        self._security_group_id = get_security_group(
-            vpc_id=self._vpc_id,
+        return execution_role_arn, task_definition
+
+    def _init_network(self) -> tuple[str, str, str]:
+        vpc_id, subnet_id = get_default_vpc_and_subnet()
+        security_group_id = get_security_group(
+            vpc_id=vpc_id,
             port=self._config.port,
             security_group_prefix=self._config.security_group_prefix,
         )
-        self._container_name = get_container_name(self._config.image)
+        return vpc_id, subnet_id, security_group_id
 
     def _get_container_name(self) -> str:
         return self._container_name
@@ -90,14 +301,56 @@ class FargateDeployment(AbstractDeployment):
         """
         if self._runtime is None or self._task_arn is None:
             raise DeploymentNotStartedError()
-        else:
-            # check if the task is running
-            ecs_client = boto3.client("ecs")
-            task_details = ecs_client.describe_tasks(cluster=self._cluster_arn, tasks=[self._task_arn])
-            if task_details["tasks"][0]["lastStatus"] != "RUNNING":
-                msg = f"Container process not running: {task_details['tasks'][0]['lastStatus']}"
-                raise RuntimeError(msg)
-        return await self._runtime.is_alive(timeout=timeout)
+        response = await self._runtime.is_alive(timeout=timeout, use_cache=False)
+        if not response:
+            # Only ask ECS (which is slow and rate limited) about the task if the runtime does not respond
+            await self._raise_if_task_not_running()
+        return response
+
+    async def _raise_if_task_not_running(self) -> None:
+        try:
+            task = await asyncio.wait_for(
+                _get_task_describer().describe(self._cluster_arn, self._task_arn), _TASK_DESCRIBE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            msg = f"Failed to get the status of task {self._task_arn} within {_TASK_DESCRIBE_TIMEOUT:.0f}s"
+            raise RuntimeError(msg) from None
+        if task["lastStatus"] != "RUNNING":
+            msg = f"Container process not running: {task['lastStatus']}"
+            raise RuntimeError(msg)
+
+    async def _wait_for_task_running(self) -> dict:
+        """Waits until the task is running and returns its `describe_tasks` entry, which already contains the
+        network interface, so that we don't need to describe the task again to get its public IP.
+
+        Raises:
+            RuntimeError: If the task stopped before it was running
+            TimeoutError: If the task is not running after `_TASK_START_TIMEOUT` seconds
+        """
+        try:
+            return await asyncio.wait_for(
+                _get_task_describer().wait_until(self._cluster_arn, self._task_arn, _is_running), _TASK_START_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            msg = f"Task {self._task_arn} is not running after {_TASK_START_TIMEOUT:.0f}s"
+            raise TimeoutError(msg) from None
+
+    async def _get_public_ip_early(self) -> str:
+        """Returns the public IP of the task as soon as its network interface is attached."""
+        task = await _get_task_describer().wait_until(self._cluster_arn, self._task_arn, _has_network_interface)
+        return await asyncio.to_thread(get_task_public_ip, task)
+
+    async def _get_public_ip(self, public_ip_task: "asyncio.Task[str]", running_task: dict) -> str:
+        """Returns the result of the early public IP lookup, or looks up the public IP from the `describe_tasks`
+        entry of the running task if the early lookup failed or does not finish in time.
+        """
+        try:
+            return await asyncio.wait_for(public_ip_task, _PUBLIC_IP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.debug(f"Network interface not reported as attached within {_PUBLIC_IP_TIMEOUT:.0f}s")
+        except Exception as e:
+            self.logger.debug(f"Failed to get the public IP before the task was running: {e}")
+        return await asyncio.to_thread(get_task_public_ip, running_task)
 
     async def _wait_until_alive(self, timeout: float):
         return await _wait_until_alive(self.is_alive, timeout=timeout, function_timeout=self._config.container_timeout)
@@ -124,11 +377,16 @@ class FargateDeployment(AbstractDeployment):
         self,
     ):
         """Starts the runtime."""
-        self._init_aws()
+        from swerex.runtime.remote import RemoteRuntime
+
+        await asyncio.to_thread(self._init_aws)
         self._container_name = self._get_container_name()
         self.logger.info(f"Starting runtime with container name {self._container_name}")
         token = self._get_token()
-        self._task_arn = run_fargate_task(
+        # The boto3 calls block, so we run them in threads. This way, deployments that are started concurrently
+        # wait for their tasks at the same time rather than one after the other.
+        self._task_arn = await asyncio.to_thread(
+            run_fargate_task,
             command=self._get_command(token=token),
             name=self._container_name,
             task_definition_arn=self._task_definition["taskDefinitionArn"],
@@ -138,11 +396,16 @@ class FargateDeployment(AbstractDeployment):
             **self._config.fargate_args,
         )
         self.logger.info(f"Container task submitted: {self._task_arn} - waiting for it to start...")
-        # wait until the container is running
+        # wait until the container is running. The network interface is attached before that (while the image
+        # is pulled), so we look up the public IP in the meantime.
         t0 = time.time()
-        ecs_client = boto3.client("ecs")
-        waiter = ecs_client.get_waiter("tasks_running")
-        waiter.wait(cluster=self._cluster_arn, tasks=[self._task_arn])
+        public_ip_task = asyncio.create_task(self._get_public_ip_early())
+        try:
+            task = await self._wait_for_task_running()
+        except BaseException:
+            public_ip_task.cancel()
+            await asyncio.gather(public_ip_task, return_exceptions=True)
+            raise
         self.logger.info(f"Fargate container started in {time.time() - t0:.2f}s")
         if self._config.log_group:
             try:
@@ -154,7 +417,7 @@ class FargateDeployment(AbstractDeployment):
                 self.logger.info(f"Monitor logs at: {log_url}")
             except Exception as e:
                 self.logger.warning(f"Failed to get CloudWatch Logs URL: {str(e)}")
-        public_ip = get_public_ip(self._task_arn, self._cluster_arn)
+        public_ip = await self._get_public_ip(public_ip_task, task)
         self.logger.info(f"Container public IP: {public_ip}")
         self._runtime = RemoteRuntime(host=public_ip, port=self._config.port, auth_token=token, logger=self.logger)
         t0 = time.time()
@@ -167,13 +430,12 @@ class FargateDeployment(AbstractDeployment):
             await self._runtime.close()
             self._runtime = None
         if self._task_arn is not None:
-            ecs_client = boto3.client("ecs")
-            ecs_client.stop_task(task=self._task_arn, cluster=self._cluster_arn)
+            await asyncio.to_thread(get_client("ecs").stop_task, task=self._task_arn, cluster=self._cluster_arn)
         self._task_arn = None
         self._container_name = None
 
     @property
-    def runtime(self) -> RemoteRuntime:
+    def runtime(self) -> "RemoteRuntime":
         """Returns the runtime if running.
 
         Raises:
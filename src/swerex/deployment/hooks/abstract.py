@@ -4,12 +4,12 @@ class DeploymentHook:
 
 class CombinedDeploymentHook(DeploymentHook):
     def __init__(self, hooks: list[DeploymentHook] | None = None):
-        self._hooks = []
-        for hook in hooks or []:
-            self.add_hook(hook)
+        self._hooks: tuple[DeploymentHook, ...] = tuple(hooks or ())
 
     def add_hook(self, hook: DeploymentHook):
-        self._hooks.append(hook)
+        # Adding hooks is rare, so we rebuild the tuple here to keep iterating over it cheap (and safe if a hook
+        # adds another hook while it is being called).
+        self._hooks = (*self._hooks, hook)
 
     def on_custom_step(self, message: str):
         for hook in self._hooks:
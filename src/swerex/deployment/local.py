@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Self
 
@@ -8,13 +8,18 @@ from swerex.deployment.config import LocalDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.local import LocalRuntime
-from swerex.utils.log import get_logger
+
+if TYPE_CHECKING:
+    from swerex.runtime.local import LocalRuntime
 
 __all__ = ["LocalDeployment", "LocalDeploymentConfig"]
 
+_NOT_STARTED_RESPONSE = IsAliveResponse(is_alive=False, message="Runtime is None.")
+
 
 class LocalDeployment(AbstractDeployment):
+    __slots__ = ("_runtime", "_config", "_hooks")
+
     def __init__(
         self,
         *,
@@ -28,6 +33,8 @@ class LocalDeployment(AbstractDeployment):
         Args:
             **kwargs: Keyword arguments (see `LocalDeploymentConfig` for details).
         """
+        from swerex.utils.log import get_logger
+
         self._runtime = None
         self.logger = logger or get_logger("rex-deploy")
         self._config = LocalDeploymentConfig(**kwargs)
@@ -48,11 +55,13 @@ class LocalDeployment(AbstractDeployment):
             DeploymentNotStartedError: If the deployment was not started.
         """
         if self._runtime is None:
-            return IsAliveResponse(is_alive=False, message="Runtime is None.")
+            return _NOT_STARTED_RESPONSE
         return await self._runtime.is_alive(timeout=timeout)
 
     async def start(self):
         """Starts the runtime."""
+        from swerex.runtime.local import LocalRuntime
+
         self._runtime = LocalRuntime(logger=self.logger)
 
     async def stop(self):
@@ -62,7 +71,7 @@ class LocalDeployment(AbstractDeployment):
             self._runtime = None
 
     @property
-    def runtime(self) -> LocalRuntime:
+    def runtime(self) -> "LocalRuntime":
         """Returns the runtime if running.
 
         Raises:
@@ -4,7 +4,7 @@ import os
 import time
 import uuid
 from pathlib import Path, PurePath
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import boto3
 import modal
@@ -17,10 +17,12 @@ from swerex.deployment.config import ModalDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.remote import RemoteRuntime
 from swerex.utils.log import get_logger
 from swerex.utils.wait import _wait_until_alive
 
+if TYPE_CHECKING:
+    from swerex.runtime.remote import RemoteRuntime
+
 __all__ = ["ModalDeployment"]
 
 
@@ -108,6 +110,21 @@ class _ImageBuilder:
 
 
 class ModalDeployment(AbstractDeployment):
+    __slots__ = (
+        "_image",
+        "_runtime",
+        "_startup_timeout",
+        "_sandbox",
+        "_port",
+        "_app",
+        "_user",
+        "_runtime_timeout",
+        "_deployment_timeout",
+        "_modal_kwargs",
+        "_hooks",
+        "_install_pipx",
+    )
+
     # Leave the constructor args for now, because image can take a modal.Image
     # but we don't want to make this part of the config class because it would
     # force us to have modal installed/import it...
@@ -184,7 +201,7 @@ class ModalDeployment(AbstractDeployment):
             output += "\nstderr:\n" + await self._sandbox.stderr.read.aio()  # type: ignore
             msg += "\n" + output
             raise RuntimeError(msg)
-        return await self._runtime.is_alive(timeout=timeout)
+        return await self._runtime.is_alive(timeout=timeout, use_cache=False)
 
     async def _wait_until_alive(self, timeout: float = 10.0):
         assert self._runtime is not None
@@ -209,6 +226,8 @@ class ModalDeployment(AbstractDeployment):
         self,
     ):
         """Starts the runtime."""
+        from swerex.runtime.remote import RemoteRuntime
+
         self.logger.info("Starting modal sandbox")
         self._hooks.on_custom_step("Starting modal sandbox")
         t0 = time.time()
@@ -254,7 +273,7 @@ class ModalDeployment(AbstractDeployment):
         self._app = None
 
     @property
-    def runtime(self) -> RemoteRuntime:
+    def runtime(self) -> "RemoteRuntime":
         """Returns the runtime if running.
 
         Raises:
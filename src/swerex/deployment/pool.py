@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+from swerex.deployment.abstract import AbstractDeployment, stop_all
+from swerex.deployment.config import DeploymentConfig, get_deployment
+from swerex.utils.log import get_logger
+
+__all__ = ["DeploymentPool"]
+
+
+class DeploymentPool:
+    def __init__(self, config: DeploymentConfig, *, size: int = 1, logger: logging.Logger | None = None):
+        """Keeps `size` deployments with the same configuration started and on standby, so that `acquire`
+        returns a running deployment without waiting for it to start (e.g., for a docker container to boot).
+
+        Deployments are never reused: every deployment returned by `acquire` is fresh, and the caller is
+        responsible for stopping it. A replacement is started in the background right away.
+
+        Args:
+            config: Configuration of the deployments. For docker, leave `port` unset, so that every
+                deployment gets its own port.
+            size: Number of deployments to keep on standby.
+        """
+        if size < 1:
+            msg = f"Pool size must be at least 1, got {size}"
+            raise ValueError(msg)
+        if getattr(config, "port", None) is not None:
+            msg = "Deployments in a pool cannot share a port. Please leave `port` unset."
+            raise ValueError(msg)
+        self._config = config
+        self._size = size
+        self.logger = logger or get_logger("rex-deploy")
+        self._ready: asyncio.Queue[AbstractDeployment | BaseException] = asyncio.Queue()
+        self._starting: set[asyncio.Task] = set()
+        self._closed = False
+
+    async def __aenter__(self):
+        self._fill()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _fill(self) -> None:
+        while not self._closed and len(self._starting) + self._ready.qsize() < self._size:
+            task = asyncio.create_task(self._start_one())
+            self._starting.add(task)
+            task.add_done_callback(self._starting.discard)
+
+    async def _start_one(self) -> None:
+        deployment = get_deployment(self._config)
+        try:
+            await deployment.start()
+        except BaseException as e:
+            # Also stop deployments whose start was cancelled by `close`, they might be half started
+            await stop_all([deployment])
+            if not isinstance(e, Exception):
+                raise
+            self._ready.put_nowait(e)
+            return
+        self._ready.put_nowait(deployment)
+
+    async def acquire(self) -> AbstractDeployment:
+        """Returns a started deployment. Call `stop` on it when you are done.
+
+        Raises:
+            Exception: Whatever was raised when starting the deployment.
+        """
+        if self._closed:
+            msg = "Pool is closed"
+            raise RuntimeError(msg)
+        self._fill()
+        item = await self._ready.get()
+        self._fill()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def close(self) -> None:
+        """Stops all deployments that are on standby or still starting."""
+        self._closed = True
+        for task in self._starting:
+            task.cancel()
+        await asyncio.gather(*self._starting, return_exceptions=True)
+        idle = []
+        while not self._ready.empty():
+            item = self._ready.get_nowait()
+            if isinstance(item, AbstractDeployment):
+                idle.append(item)
+        await stop_all(idle)
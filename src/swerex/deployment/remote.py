@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Self
 
@@ -8,11 +8,14 @@ from swerex.deployment.config import RemoteDeploymentConfig
 from swerex.deployment.hooks.abstract import CombinedDeploymentHook, DeploymentHook
 from swerex.exceptions import DeploymentNotStartedError
 from swerex.runtime.abstract import IsAliveResponse
-from swerex.runtime.remote import RemoteRuntime
-from swerex.utils.log import get_logger
+
+if TYPE_CHECKING:
+    from swerex.runtime.remote import RemoteRuntime
 
 
 class RemoteDeployment(AbstractDeployment):
+    __slots__ = ("_config", "_runtime", "_hooks")
+
     def __init__(self, *, logger: logging.Logger | None = None, **kwargs: Any):
         """This deployment is only a thin wrapper around the `RemoteRuntime`.
         Use this if you have deployed a runtime somewhere else but want to interact with it
@@ -24,6 +27,8 @@ class RemoteDeployment(AbstractDeployment):
         Args:
             **kwargs: Keyword arguments (see `RemoteDeploymentConfig` for details).
         """
+        from swerex.utils.log import get_logger
+
         self._config = RemoteDeploymentConfig(**kwargs)
         self._runtime: RemoteRuntime | None = None
         self.logger = logger or get_logger("rex-deploy")
@@ -37,7 +42,7 @@ class RemoteDeployment(AbstractDeployment):
         return cls(**config.model_dump())
 
     @property
-    def runtime(self) -> RemoteRuntime:
+    def runtime(self) -> "RemoteRuntime":
         """Returns the runtime if running.
 
         Raises:
@@ -58,6 +63,8 @@ class RemoteDeployment(AbstractDeployment):
 
     async def start(self):
         """Starts the runtime."""
+        from swerex.runtime.remote import RemoteRuntime
+
         self.logger.info("Starting remote runtime")
         self._runtime = RemoteRuntime(
             auth_token=self._config.auth_token,
@@ -2,7 +2,7 @@ import logging
 from abc import ABC, abstractmethod
 from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 
 
@@ -12,6 +12,8 @@ class IsAliveResponse(BaseModel):
     You can test the result with bool().
     """
 
+    model_config = ConfigDict(frozen=True)
+
     is_alive: bool
 
     message: str = ""
@@ -33,6 +35,9 @@ class CreateBashSessionRequest(BaseModel):
     """The timeout for the startup commands."""
 
 class CreateBwrapBashSessionRequest(BaseModel):
+    # Only used with bwrap runtimes, so we don't build the schema before it's needed
+    model_config = ConfigDict(defer_build=True)
+
     startup_source: list[str] = []
     """Source the following files before running commands."""
     
@@ -63,6 +68,8 @@ class CreateBashSessionResponse(BaseModel):
     session_type: Literal["bash"] = "bash"
 
 class CreateBwrapBashSessionResponse(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     output: str = ""
     session_type: Literal["bwrap_bash"] = "bwrap_bash"
 
@@ -154,6 +161,8 @@ class CloseBashSessionRequest(BaseModel):
     session_type: Literal["bash"] = "bash"
 
 class CloseBwrapBashSessionRequest(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     session: str = "default"
     session_type: Literal["bwrap_bash"] = "bwrap_bash"
 
@@ -166,9 +175,13 @@ CloseSessionRequest = Annotated[
 
 
 class CloseBashSessionResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     session_type: Literal["bash"] = "bash"
 
 class CloseBwrapBashSessionResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, defer_build=True)
+
     session_type: Literal["bwrap_bash"] = "bwrap_bash"
 
 CloseSessionResponse = Annotated[
@@ -239,7 +252,7 @@ class WriteFileRequest(BaseModel):
 
 
 class WriteFileResponse(BaseModel):
-    pass
+    model_config = ConfigDict(frozen=True)
 
 
 class UploadRequest(BaseModel):
@@ -248,11 +261,11 @@ class UploadRequest(BaseModel):
 
 
 class UploadResponse(BaseModel):
-    pass
+    model_config = ConfigDict(frozen=True)
 
 
 class CloseResponse(BaseModel):
-    pass
+    model_config = ConfigDict(frozen=True)
 
 
 class _ExceptionTransfer(BaseModel):
@@ -291,6 +304,13 @@ class AbstractRuntime(ABC):
         """
         pass
 
+    async def run_in_session_batch(self, actions: list[Action]) -> list[Observation]:
+        """Runs several actions one after the other (see `run_in_session`).
+        If one of the actions raises an exception, the remaining actions are not run.
+        Runtimes can override this to avoid one round trip per action.
+        """
+        return [await self.run_in_session(action) for action in actions]
+
     @abstractmethod
     async def close_session(self, request: CloseSessionRequest) -> CloseSessionResponse:
         """Closes a shell session (e.g., a bash shell that we started earlier)."""
@@ -119,7 +119,7 @@ class BwrapBashSession(BashSession):
             encoding="utf-8",
             codec_errors="backslashreplace",
             echo=False,
-            env={"PS1": self._ps1, "PS2": "", "PS0": ""},  # type: ignore
+            env={"PS1": self._prompt, "PS2": "", "PS0": ""},  # type: ignore
         )
 
         time.sleep(0.3)
@@ -132,8 +132,9 @@ class BwrapBashSession(BashSession):
         cmd = " ; ".join(cmds)
 
         self.shell.sendline(cmd)
-        self.shell.expect(self._ps1, timeout=self.request.startup_timeout)
-        output = _strip_control_chars(self.shell.before)  # type: ignore
+        _, output = self._expect([self._ps1], timeout=self.request.startup_timeout)
+        output, _ = self._split_exit_code(output)
+        output = _strip_control_chars(output)
 
         return CreateBwrapBashSessionResponse(output=output)
 
@@ -143,6 +144,7 @@ class BwrapBashSession(BashSession):
             return CloseBwrapBashSessionResponse()
         self.shell.close()
         self._shell = None
+        self._pending_output = ""
         return CloseBwrapBashSessionResponse()
 
 class BwrapRuntime(LocalRuntime):
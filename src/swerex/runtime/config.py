@@ -23,7 +23,9 @@ class RemoteRuntimeConfig(BaseModel):
     auth_token: str
     """The token to use for authentication."""
     host: str = "http://127.0.0.1"
-    """The host to connect to."""
+    """The host to connect to. Use `unix:///path/to/socket` to connect to a server
+    that was started with `--uds` (the port is ignored in this case).
+    """
     port: int | None = None
     """The port to connect to."""
     timeout: float = 0.15
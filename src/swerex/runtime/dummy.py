@@ -29,6 +29,8 @@ from swerex.runtime.abstract import (
 from swerex.runtime.config import DummyRuntimeConfig
 from swerex.utils.log import get_logger
 
+_IS_ALIVE_RESPONSE = IsAliveResponse(is_alive=True)
+
 
 class DummyRuntime(AbstractRuntime):
     def __init__(
@@ -55,7 +57,7 @@ class DummyRuntime(AbstractRuntime):
         return cls(**config.model_dump())
 
     async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
-        return IsAliveResponse(is_alive=True)
+        return _IS_ALIVE_RESPONSE
 
     async def create_session(self, request: CreateSessionRequest) -> CreateSessionResponse:
         if request.session_type == "bash":
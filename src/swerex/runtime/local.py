@@ -1,10 +1,11 @@
+import asyncio
 import logging
 import re
+import secrets
 import shutil
 import subprocess
 import time
 from abc import ABC, abstractmethod
-from copy import deepcopy
 from pathlib import Path
 from typing import Any
 
@@ -53,6 +54,14 @@ from swerex.utils.log import get_logger
 
 __all__ = ["LocalRuntime", "BashSession"]
 
+# These responses are immutable and don't carry any information beyond their type,
+# so we don't need to construct (and validate) new ones for every request.
+_IS_ALIVE_RESPONSE = IsAliveResponse(is_alive=True)
+_CLOSE_BASH_SESSION_RESPONSE = CloseBashSessionResponse()
+_WRITE_FILE_RESPONSE = WriteFileResponse()
+_UPLOAD_RESPONSE = UploadResponse()
+_CLOSE_RESPONSE = CloseResponse()
+
 
 def _split_bash_command(inpt: str) -> list[str]:
     r"""Split a bash command with linebreaks, escaped newlines, and heredocs into a list of
@@ -126,6 +135,14 @@ class Session(ABC):
 
 class BashSession(Session):
     _UNIQUE_STRING = "UNIQUESTRING29234"
+    _EXIT_CODE_PREFIX = "EXITCODESTART"
+    """Our PS1 prints the exit code of the last command after this string, right before the `_ps1` marker."""
+    _READ_CHUNK_SIZE = 65536
+    """Maximum number of characters that are read from the shell at once."""
+    _SEARCH_LOOKBACK = 4096
+    """Number of characters of previous output that are searched together with every new chunk.
+    This limits the length of the strings that we can expect.
+    """
 
     def __init__(self, request: CreateBashSessionRequest, *, logger: logging.Logger | None = None):
         """This basically represents one REPL that we control.
@@ -133,8 +150,14 @@ class BashSession(Session):
         It's pretty similar to a `pexpect.REPLWrapper`.
         """
         self.request = request
-        self._ps1 = "SHELLPS1PREFIX"
+        # Random suffix, so that the PS1 doesn't show up in any command output by accident
+        self._ps1 = f"SHELLPS1PREFIX{secrets.token_hex(8)}"
+        self._prompt = f"{self._EXIT_CODE_PREFIX}$?{self._ps1}"
+        """The actual PS1. We only expect the `_ps1` marker at its end."""
+        self._prompt_regex = re.compile(re.escape(self._EXIT_CODE_PREFIX) + "[0-9]+" + re.escape(self._ps1))
         self._shell: pexpect.spawn | None = None
+        self._pending_output = ""
+        """Output that has been read from the shell but was not consumed by `_expect` yet."""
         self.logger = logger or get_logger("rex-session")
 
     @property
@@ -147,7 +170,7 @@ class BashSession(Session):
     def _get_reset_commands(self) -> list[str]:
         """Commands to reset the PS1, PS2, and PS0 variables to their default values."""
         return [
-            f"export PS1='{self._ps1}'",
+            f"export PS1='{self._prompt}'",
             "export PS2=''",
             "export PS0=''",
         ]
@@ -159,7 +182,7 @@ class BashSession(Session):
             encoding="utf-8",
             codec_errors="backslashreplace",
             echo=False,
-            env={"PS1": self._ps1, "PS2": "", "PS0": ""},  # type: ignore
+            env={"PS1": self._prompt, "PS2": "", "PS0": ""},  # type: ignore
         )
         time.sleep(0.3)
         cmds = []
@@ -168,9 +191,80 @@ class BashSession(Session):
         cmds += self._get_reset_commands()
         cmd = " ; ".join(cmds)
         self.shell.sendline(cmd)
-        self.shell.expect(self._ps1, timeout=self.request.startup_timeout)
-        output = _strip_control_chars(self.shell.before)  # type: ignore
-        return CreateBashSessionResponse(output=output)
+        _, output = self._expect([self._ps1], timeout=self.request.startup_timeout)
+        output, _ = self._split_exit_code(output)
+        return CreateBashSessionResponse(output=_strip_control_chars(output))
+
+    def _expect(self, patterns: list[str | re.Pattern[str]], timeout: float | None) -> tuple[int, str]:
+        """Read from the shell until one of `patterns` matches.
+        Strings are matched literally (this is what we use for the PS1 and our other markers),
+        compiled patterns as regular expressions.
+
+        This replaces `pexpect.spawn.expect`, which copies and searches its complete buffer
+        for every small read, making it quadratic in the length of the output.
+        Here, we read large chunks, collect them in a list, and only search every new chunk
+        together with the last `_SEARCH_LOOKBACK` characters of the previous output.
+        Literal strings are searched with `str.find`, starting just before the new chunk.
+
+        Returns:
+            The index of the pattern that matched first and the output before the match.
+
+        Raises:
+            pexpect.TIMEOUT: If none of the patterns matched within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        chunks: list[str] = []
+        n_read = 0
+        tail = ""
+        data, self._pending_output = self._pending_output, ""
+        while True:
+            if data:
+                window = tail + data
+                best: tuple[int, tuple[int, int]] | None = None
+                for index, pattern in enumerate(patterns):
+                    if isinstance(pattern, str):
+                        # The tail was already searched, except for a possible match that overlaps with the new data
+                        start = window.find(pattern, max(0, len(tail) - len(pattern) + 1))
+                        span = (start, start + len(pattern)) if start != -1 else None
+                    else:
+                        match = pattern.search(window)
+                        span = match.span() if match is not None else None
+                    if span is not None and (best is None or span[0] < best[1][0]):
+                        best = (index, span)
+                chunks.append(data)
+                if best is not None:
+                    index, (start, end) = best
+                    output = "".join(chunks)
+                    offset = n_read - len(tail)
+                    self._pending_output = output[offset + end :]
+                    return index, output[: offset + start]
+                n_read += len(data)
+                tail = window[-self._SEARCH_LOOKBACK :]
+            remaining = None if deadline is None else deadline - time.monotonic()
+            try:
+                if remaining is not None and remaining <= 0:
+                    msg = f"Timeout exceeded while waiting for {patterns!r}"
+                    raise pexpect.TIMEOUT(msg)
+                data = self.shell.read_nonblocking(self._READ_CHUNK_SIZE, timeout=remaining)
+            except (pexpect.TIMEOUT, pexpect.EOF):
+                # Keep everything we've read for whoever reads from the shell next
+                self._pending_output = "".join(chunks)
+                raise
+
+    def _split_exit_code(self, output: str) -> tuple[str, int | None]:
+        """Split the exit code that our PS1 prints off the end of the output that came before the `_ps1` marker.
+
+        Returns:
+            The output without the exit code and the exit code (None if it wasn't there).
+        """
+        head, sep, exit_code = output.rpartition(self._EXIT_CODE_PREFIX)
+        if not sep or not exit_code.isdigit():
+            return output, None
+        return head, int(exit_code)
+
+    def _get_expect_patterns(self, expect: list[str]) -> list[str | re.Pattern[str]]:
+        """Expect strings of actions are regular expressions (as with pexpect), followed by the literal PS1."""
+        return [re.compile(pattern) for pattern in expect] + [self._ps1]
 
     def _eat_following_output(self, timeout: float = 0.5) -> str:
         """Return all output that happens in the next `timeout` seconds."""
@@ -183,31 +277,33 @@ class BashSession(Session):
 
     async def interrupt(self, action: BashInterruptAction) -> BashObservation:
         """Interrupt the session."""
-        output = ""
+        expect_strings = action.expect + [self._ps1]
+        patterns = self._get_expect_patterns(action.expect)
         for _ in range(action.n_retry):
             self.shell.sendintr()
-            expect_strings = action.expect + [self._ps1]
             try:
-                expect_index = self.shell.expect(expect_strings, timeout=action.timeout)  # type: ignore
+                expect_index, before = self._expect(patterns, timeout=action.timeout)
                 matched_expect_string = expect_strings[expect_index]
             except Exception:
                 time.sleep(0.2)
                 continue
-            output += _strip_control_chars(self.shell.before)  # type: ignore
-            output += self._eat_following_output()
-            output = output.strip()
+            if matched_expect_string == self._ps1:
+                before, _ = self._split_exit_code(before)
+            output = "".join([_strip_control_chars(before), self._eat_following_output()]).strip()
             return BashObservation(output=output, exit_code=0, expect_string=matched_expect_string)
         # Fall back to putting job to background and killing it there:
         try:
             self.shell.sendcontrol("z")
-            self.shell.expect(expect_strings, timeout=action.timeout)
-            output += self.shell.before
+            expect_index, before_suspend = self._expect(patterns, timeout=action.timeout)
+            if expect_strings[expect_index] == self._ps1:
+                before_suspend, _ = self._split_exit_code(before_suspend)
             self.shell.sendline("kill -9 %1")
-            expect_index = self.shell.expect(expect_strings, timeout=action.timeout)  # type: ignore
+            expect_index, before_kill = self._expect(patterns, timeout=action.timeout)
             matched_expect_string = expect_strings[expect_index]
-            output += self.shell.before
-            output += self._eat_following_output()
-            output = output.strip()
+            if matched_expect_string == self._ps1:
+                before_kill, _ = self._split_exit_code(before_kill)
+            output = "".join([before_suspend, before_kill, self._eat_following_output()])
+            output = self._prompt_regex.sub("", output).strip()
             return BashObservation(output=output, exit_code=0, expect_string=matched_expect_string)
         except pexpect.TIMEOUT:
             msg = "Failed to interrupt session"
@@ -248,20 +344,22 @@ class BashSession(Session):
         self.shell.sendline(action.command)
         expect_strings = action.expect + [self._ps1]
         try:
-            expect_index = self.shell.expect(expect_strings, timeout=action.timeout)  # type: ignore
+            expect_index, before = self._expect(self._get_expect_patterns(action.expect), timeout=action.timeout)
             matched_expect_string = expect_strings[expect_index]
         except pexpect.TIMEOUT as e:
             msg = f"timeout after {action.timeout} seconds while running command {action.command!r}"
             raise CommandTimeoutError(msg) from e
-        output: str = _strip_control_chars(self.shell.before).strip()  # type: ignore
+        if matched_expect_string == self._ps1:
+            before, _ = self._split_exit_code(before)
+        output: str = _strip_control_chars(before).strip()
         if action.is_interactive_quit:
             assert not action.is_interactive_command
             self.shell.setecho(False)
             self.shell.waitnoecho()
             self.shell.sendline(f"stty -echo; echo '{self._UNIQUE_STRING}'")
             # Might need two expects for some reason
-            self.shell.expect(self._UNIQUE_STRING, timeout=1)
-            self.shell.expect(self._ps1, timeout=1)
+            self._expect([self._UNIQUE_STRING], timeout=1)
+            self._expect([self._ps1], timeout=1)
         else:
             # Interactive command.
             # For some reason, this often times enables echo mode within the shell.
@@ -277,8 +375,11 @@ class BashSession(Session):
         1. Check if the command is valid
         2. Execute the command
         3. Get the exit code
+
+        The exit code is part of the PS1, so we get it from the same read that waits for the command to finish.
         """
-        action = deepcopy(action)
+        # Shallow copy is enough, because we only reassign the command
+        action = action.model_copy()
 
         assert self.shell is not None
         _check_bash_command(action.command)
@@ -304,43 +405,39 @@ class BashSession(Session):
         self.shell.sendline(action.command)
         if not fallback_terminator:
             expect_strings = action.expect + [self._ps1]
+            patterns = self._get_expect_patterns(action.expect)
         else:
             expect_strings = [self._UNIQUE_STRING]
+            patterns = [self._UNIQUE_STRING]
         try:
-            expect_index = self.shell.expect(expect_strings, timeout=action.timeout)  # type: ignore
+            expect_index, before = self._expect(patterns, timeout=action.timeout)
             matched_expect_string = expect_strings[expect_index]
         except pexpect.TIMEOUT as e:
             msg = f"timeout after {action.timeout} seconds while running command {action.command!r}"
             raise CommandTimeoutError(msg) from e
-        output: str = _strip_control_chars(self.shell.before).strip()  # type: ignore
+        exit_code = None
+        if matched_expect_string == self._ps1:
+            before, exit_code = self._split_exit_code(before)
+        output: str = _strip_control_chars(before).strip()
 
         # Part 3: Get the exit code
         if action.check == "ignore":
             return BashObservation(output=output, exit_code=None, expect_string=matched_expect_string)
 
         try:
-            _exit_code_prefix = "EXITCODESTART"
-            _exit_code_suffix = "EXITCODEEND"
-            self.shell.sendline(f"\necho {_exit_code_prefix}$?{_exit_code_suffix}")
-            try:
-                self.shell.expect(_exit_code_suffix, timeout=1)
-            except pexpect.TIMEOUT:
-                msg = "timeout while getting exit code"
+            if fallback_terminator:
+                # The exit code comes with the prompt after the terminator
+                try:
+                    _, before = self._expect([self._ps1], timeout=1)
+                except pexpect.TIMEOUT:
+                    msg = "timeout while getting exit code"
+                    raise NoExitCodeError(msg)
+                rest, exit_code = self._split_exit_code(_strip_control_chars(before))
+                output += rest.strip()
+            if exit_code is None:
+                msg = f"failed to parse exit code from output {output!r} (command: {action.command!r})"
                 raise NoExitCodeError(msg)
-            exit_code_raw: str = _strip_control_chars(self.shell.before).strip()  # type: ignore
-            exit_code = re.findall(f"{_exit_code_prefix}([0-9]+)", exit_code_raw)
-            if len(exit_code) != 1:
-                msg = f"failed to parse exit code from output {exit_code_raw!r} (command: {action.command!r}, matches: {exit_code})"
-                raise NoExitCodeError(msg)
-            output += exit_code_raw.split(_exit_code_prefix)[0]
-            exit_code = int(exit_code[0])
-            # We get at least one more PS1 here.
-            try:
-                self.shell.expect(self._ps1, timeout=0.1)
-            except pexpect.TIMEOUT:
-                msg = "Timeout while getting PS1 after exit code extraction"
-                raise CommandTimeoutError(msg)
-            output = output.replace(self._UNIQUE_STRING, "").replace(self._ps1, "")
+            output = self._prompt_regex.sub("", output.replace(self._UNIQUE_STRING, ""))
         except Exception:
             # Ignore all exceptions if check == 'silent'
             if action.check == "raise":
@@ -350,10 +447,11 @@ class BashSession(Session):
 
     async def close(self) -> CloseSessionResponse:
         if self._shell is None:
-            return CloseBashSessionResponse()
+            return _CLOSE_BASH_SESSION_RESPONSE
         self.shell.close()
         self._shell = None
-        return CloseBashSessionResponse()
+        self._pending_output = ""
+        return _CLOSE_BASH_SESSION_RESPONSE
 
     def interact(self) -> None:
         """Enter interactive mode."""
@@ -383,7 +481,7 @@ class LocalRuntime(AbstractRuntime):
 
     async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
         """Checks if the runtime is alive."""
-        return IsAliveResponse(is_alive=True)
+        return _IS_ALIVE_RESPONSE
 
     async def create_session(self, request: CreateSessionRequest) -> CreateSessionResponse:
         """Creates a new session."""
@@ -400,18 +498,21 @@ class LocalRuntime(AbstractRuntime):
 
     async def run_in_session(self, action: Action) -> Observation:
         """Runs a command in a session."""
-        if action.session not in self.sessions:
-            msg = f"session {action.session!r} does not exist in :{self.sessions!r}"
+        # This is called for every action, so we only look up the session once
+        session = self._sessions.get(action.session)
+        if session is None:
+            msg = f"session {action.session!r} does not exist in :{self._sessions!r}"
             raise SessionDoesNotExistError(msg)
-        return await self.sessions[action.session].run(action)
+        return await session.run(action)
 
     async def close_session(self, request: CloseSessionRequest) -> CloseSessionResponse:
         """Closes a shell session."""
-        if request.session not in self.sessions:
+        session = self._sessions.get(request.session)
+        if session is None:
             msg = f"session {request.session!r} does not exist"
             raise SessionDoesNotExistError(msg)
-        out = await self.sessions[request.session].close()
-        del self.sessions[request.session]
+        out = await session.close()
+        del self._sessions[request.session]
         return out
 
     async def execute(self, command: Command) -> CommandResponse:
@@ -421,26 +522,36 @@ class LocalRuntime(AbstractRuntime):
             CommandTimeoutError: If the command times out.
             NonZeroExitCodeError: If the command has a non-zero exit code and `check` is True.
         """
+        # Run the command without blocking the event loop, so that the server can handle
+        # other requests in the meantime. Arguments are handled exactly like `subprocess.run`.
+        args = [command.command] if isinstance(command.command, str) else command.command
+        if command.shell:
+            args = ["/bin/sh", "-c", *args]
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=command.env,
+            cwd=command.cwd,
+        )
         try:
-            result = subprocess.run(
-                command.command,
-                shell=command.shell,
-                timeout=command.timeout,
-                env=command.env,
-                capture_output=True,
-                cwd=command.cwd,
-            )
-            r = CommandResponse(
-                stdout=result.stdout.decode(errors="backslashreplace"),
-                stderr=result.stderr.decode(errors="backslashreplace"),
-                exit_code=result.returncode,
-            )
-        except subprocess.TimeoutExpired as e:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=command.timeout)
+        except asyncio.TimeoutError as e:
             msg = f"Timeout ({command.timeout}s) exceeded while running command"
             raise CommandTimeoutError(msg) from e
-        if command.check and result.returncode != 0:
+        finally:
+            # Don't leave the command running if we time out or are cancelled (e.g., the client disconnected)
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        r = CommandResponse(
+            stdout=stdout.decode(errors="backslashreplace"),
+            stderr=stderr.decode(errors="backslashreplace"),
+            exit_code=process.returncode,
+        )
+        if command.check and process.returncode != 0:
             msg = (
-                f"Command {command.command!r} failed with exit code {result.returncode}. "
+                f"Command {command.command!r} failed with exit code {process.returncode}. "
                 f"Stdout:\n{r.stdout!r}\nStderr:\n{r.stderr!r}"
             )
             if command.error_msg:
@@ -457,7 +568,7 @@ class LocalRuntime(AbstractRuntime):
         """Writes a file"""
         Path(request.path).parent.mkdir(parents=True, exist_ok=True)
         Path(request.path).write_text(request.content)
-        return WriteFileResponse()
+        return _WRITE_FILE_RESPONSE
 
     async def upload(self, request: UploadRequest) -> UploadResponse:
         """Uploads a file"""
@@ -465,10 +576,10 @@ class LocalRuntime(AbstractRuntime):
             shutil.copytree(request.source_path, request.target_path)
         else:
             shutil.copy(request.source_path, request.target_path)
-        return UploadResponse()
+        return _UPLOAD_RESPONSE
 
     async def close(self) -> CloseResponse:
         """Closes the runtime."""
         for session in self.sessions.values():
             await session.close()
-        return CloseResponse()
+        return _CLOSE_RESPONSE
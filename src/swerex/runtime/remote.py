@@ -1,13 +1,16 @@
+import asyncio
+import functools
 import logging
 import shutil
 import sys
 import tempfile
+import time
 import traceback
 from pathlib import Path
 from typing import Any
 
-import requests
-from pydantic import BaseModel
+import httpx
+from pydantic import BaseModel, TypeAdapter
 from typing_extensions import Self
 
 from swerex.exceptions import SwerexException
@@ -35,8 +38,31 @@ from swerex.runtime.config import RemoteRuntimeConfig
 from swerex.utils.log import get_logger
 from swerex.utils.wait import _wait_until_alive
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 __all__ = ["RemoteRuntime", "RemoteRuntimeConfig"]
 
+_IS_ALIVE_RESPONSE = IsAliveResponse(is_alive=True)
+_IS_ALIVE_TTL = 0.1
+"""Positive `is_alive` results are reused for this many seconds."""
+_MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+@functools.cache
+def _get_type_adapter(output_class: Any) -> TypeAdapter:
+    """Type adapters can also validate the discriminated unions (e.g., `Observation`)
+    that cannot be instantiated directly. Building them is expensive, so we cache them.
+    """
+    return TypeAdapter(output_class)
+
+
+def _parse_exception_transfer(response: httpx.Response) -> _ExceptionTransfer:
+    """Parse the exception that the server sends along with status code 511."""
+    return _get_type_adapter(dict[str, _ExceptionTransfer]).validate_json(response.content)["swerexception"]
+
 
 class RemoteRuntime(AbstractRuntime):
     def __init__(
@@ -52,14 +78,70 @@ class RemoteRuntime(AbstractRuntime):
         """
         self._config = RemoteRuntimeConfig(**kwargs)
         self.logger = logger or get_logger("rex-runtime")
-        if not self._config.host.startswith("http"):
+        self._uds: str | None = None
+        """Path of the unix domain socket of the server if `host` is a `unix://` URL."""
+        if self._config.host.startswith("unix://"):
+            self._uds = self._config.host.removeprefix("unix://")
+        elif not self._config.host.startswith("http"):
             self.logger.warning("Host %s does not start with http, adding http://", self._config.host)
             self._config.host = f"http://{self._config.host}"
+        self._client: httpx.AsyncClient | None = None
+        """Reused for all requests so that we benefit from keep-alive connections.
+        Use `_get_client` to access it.
+        """
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self._alive_until = 0.0
+        """Until when (`time.monotonic`) we consider the server alive without asking it again."""
 
     @classmethod
     def from_config(cls, config: RemoteRuntimeConfig) -> Self:
         return cls(**config.model_dump())
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """Returns the HTTP client for the running event loop.
+
+        Connections of an `httpx.AsyncClient` are bound to the event loop they were
+        opened in, so we start a new client if we're called from a different loop
+        (e.g., because of multiple `asyncio.run` calls).
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._drop_client()
+            self._client = httpx.AsyncClient(
+                # If the server is on the same machine, a unix domain socket saves us the TCP overhead
+                transport=httpx.AsyncHTTPTransport(uds=self._uds) if self._uds is not None else None,
+                timeout=None,
+                # Agents often pause between actions for much longer than httpx's default expiry
+                # of 5s. Stay below the server's keep-alive timeout to avoid reusing connections
+                # that the server is about to close.
+                limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _drop_client(self) -> None:
+        """Forgets the HTTP client without awaiting it in the running event loop.
+
+        The client's connections belong to the loop it was created in, so closing it from
+        another loop (e.g., the cleanup loop of `AbstractDeployment.__del__`) is not safe.
+        If that loop is still running, we hand the client back to it to be closed,
+        otherwise its connections are gone with the loop and we just drop the reference.
+        """
+        client, client_loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        if client is not None and client_loop is not None and client_loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+
+    async def _close_client(self) -> None:
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            client = self._client
+            self._client = None
+            self._client_loop = None
+            await client.aclose()
+        else:
+            self._drop_client()
+
     def _get_timeout(self, timeout: float | None = None) -> float:
         if timeout is None:
             return self._config.timeout
@@ -74,6 +156,9 @@ class RemoteRuntime(AbstractRuntime):
 
     @property
     def _api_url(self) -> str:
+        if self._uds is not None:
+            # The host name is irrelevant when talking over a unix domain socket
+            return "http://localhost"
         if self._config.port is None:
             return self._config.host
         return f"{self._config.host}:{self._config.port}"
@@ -83,7 +168,7 @@ class RemoteRuntime(AbstractRuntime):
         if exc_transfer.traceback:
             self.logger.critical("Traceback: \n%s", exc_transfer.traceback)
         module, _, exc_name = exc_transfer.class_path.rpartition(".")
-        print(module, exc_name)
+        self.logger.debug("Reraising exception %s from module %s", exc_name, module)
         if module == "builtins":
             module_obj = __builtins__
         else:
@@ -111,10 +196,10 @@ class RemoteRuntime(AbstractRuntime):
         exception.extra_info = exc_transfer.extra_info
         raise exception from None
 
-    def _handle_response_errors(self, response: requests.Response) -> None:
+    def _handle_response_errors(self, response: httpx.Response) -> None:
         """Raise exceptions found in the request response."""
         if response.status_code == 511:
-            exc_transfer = _ExceptionTransfer(**response.json()["swerexception"])
+            exc_transfer = _parse_exception_transfer(response)
             self._handle_transfer_exception(exc_transfer)
         try:
             response.raise_for_status()
@@ -122,27 +207,46 @@ class RemoteRuntime(AbstractRuntime):
             self.logger.critical("Received error response: %s", response.json())
             raise
 
-    async def is_alive(self, *, timeout: float | None = None) -> IsAliveResponse:
+    async def is_alive(self, *, timeout: float | None = None, use_cache: bool = True) -> IsAliveResponse:
         """Checks if the runtime is alive.
 
         Internal server errors are thrown, everything else just has us return False
         together with the message.
+
+        Args:
+            timeout: Timeout for the request.
+            use_cache: A positive answer is reused for `_IS_ALIVE_TTL` seconds to coalesce bursts of
+                polls, so a runtime that just died can still be reported alive during that window.
+                Set to False to always ask the server (e.g., to check whether a container died).
         """
+        now = time.monotonic()
+        if use_cache and now < self._alive_until:
+            # Coalesce bursts of polls
+            return _IS_ALIVE_RESPONSE
+        self._alive_until = 0.0
         try:
-            response = requests.get(
+            response = await self._get_client().head(
+                f"{self._api_url}/healthz", headers=self._headers, timeout=self._get_timeout(timeout)
+            )
+            if response.status_code == 204:
+                self._alive_until = now + _IS_ALIVE_TTL
+                return _IS_ALIVE_RESPONSE
+            # Older servers don't have /healthz, and for any other problems, /is_alive
+            # gives us a more helpful message.
+            response = await self._get_client().get(
                 f"{self._api_url}/is_alive", headers=self._headers, timeout=self._get_timeout(timeout)
             )
             if response.status_code == 200:
-                return IsAliveResponse(**response.json())
+                return IsAliveResponse.model_validate_json(response.content)
             elif response.status_code == 511:
-                exc_transfer = _ExceptionTransfer(**response.json()["swerexception"])
+                exc_transfer = _parse_exception_transfer(response)
                 self._handle_transfer_exception(exc_transfer)
             msg = (
                 f"Status code {response.status_code} from {self._api_url}/is_alive. "
                 f"Message: {response.json().get('detail')}"
             )
             return IsAliveResponse(is_alive=False, message=msg)
-        except requests.RequestException:
+        except httpx.HTTPError:
             msg = f"Failed to connect to {self._config.host}\n"
             msg += traceback.format_exc()
             return IsAliveResponse(is_alive=False, message=msg)
@@ -154,37 +258,59 @@ class RemoteRuntime(AbstractRuntime):
     async def wait_until_alive(self, *, timeout: float = 60.0):
         return await _wait_until_alive(self.is_alive, timeout=timeout)
 
-    def _request(self, endpoint: str, request: BaseModel | None, output_class: Any):
+    async def _request(self, endpoint: str, request: BaseModel | list[BaseModel] | None, output_class: Any):
         """Small helper to make requests to the server and handle errors and output."""
-        response = requests.post(
-            f"{self._api_url}/{endpoint}", json=request.model_dump() if request else None, headers=self._headers
-        )
+        headers = self._headers
+        if msgpack is not None:
+            # Cheaper to decode than JSON for large outputs. Servers without msgpack will send JSON.
+            headers = {**headers, "Accept": f"{_MSGPACK_MEDIA_TYPE}, application/json"}
+        if request is None:
+            response = await self._get_client().post(f"{self._api_url}/{endpoint}", headers=headers)
+        else:
+            # Let pydantic serialize directly to JSON rather than going through a dict
+            if isinstance(request, list):
+                content = _get_type_adapter(list[Any]).dump_json(request)
+            else:
+                content = request.model_dump_json()
+            response = await self._get_client().post(
+                f"{self._api_url}/{endpoint}",
+                content=content,
+                headers={**headers, "Content-Type": "application/json"},
+            )
         self._handle_response_errors(response)
-        return output_class(**response.json())
+        if response.headers.get("content-type") == _MSGPACK_MEDIA_TYPE:
+            return _get_type_adapter(output_class).validate_python(msgpack.unpackb(response.content))  # type: ignore
+        return _get_type_adapter(output_class).validate_json(response.content)
 
     async def create_session(self, request: CreateSessionRequest) -> CreateSessionResponse:
         """Creates a new session."""
-        return self._request("create_session", request, CreateSessionResponse)
+        return await self._request("create_session", request, CreateSessionResponse)
 
     async def run_in_session(self, action: Action) -> Observation:
         """Runs a command in a session."""
-        return self._request("run_in_session", action, Observation)
+        return await self._request("run_in_session", action, Observation)
+
+    async def run_in_session_batch(self, actions: list[Action]) -> list[Observation]:
+        """Runs several actions one after the other with a single request to the server.
+        If one of the actions raises an exception, the remaining actions are not run.
+        """
+        return await self._request("run_in_session_batch", actions, list[Observation])
 
     async def close_session(self, request: CloseSessionRequest) -> CloseSessionResponse:
         """Closes a shell session."""
-        return self._request("close_session", request, CloseSessionResponse)
+        return await self._request("close_session", request, CloseSessionResponse)
 
     async def execute(self, command: Command) -> CommandResponse:
         """Executes a command (independent of any shell session)."""
-        return self._request("execute", command, CommandResponse)
+        return await self._request("execute", command, CommandResponse)
 
     async def read_file(self, request: ReadFileRequest) -> ReadFileResponse:
         """Reads a file"""
-        return self._request("read_file", request, ReadFileResponse)
+        return await self._request("read_file", request, ReadFileResponse)
 
     async def write_file(self, request: WriteFileRequest) -> WriteFileResponse:
         """Writes a file"""
-        return self._request("write_file", request, WriteFileResponse)
+        return await self._request("write_file", request, WriteFileResponse)
 
     async def upload(self, request: UploadRequest) -> UploadResponse:
         """Uploads a file"""
@@ -196,22 +322,30 @@ class RemoteRuntime(AbstractRuntime):
                 zip_path = Path(temp_dir) / "zipped_transfer.zip"
                 shutil.make_archive(str(zip_path.with_suffix("")), "zip", source)
                 self.logger.debug("Created zip file at %s", zip_path)
-                files = {"file": zip_path.open("rb")}
                 data = {"target_path": request.target_path, "unzip": "true"}
-                response = requests.post(f"{self._api_url}/upload", files=files, data=data, headers=self._headers)
+                with zip_path.open("rb") as f:
+                    response = await self._get_client().post(
+                        f"{self._api_url}/upload", files={"file": f}, data=data, headers=self._headers
+                    )
                 self._handle_response_errors(response)
-                return UploadResponse(**response.json())
+                return UploadResponse.model_validate_json(response.content)
         elif source.is_file():
             self.logger.debug("Uploading file from %s to %s", source, request.target_path)
-            files = {"file": source.open("rb")}
             data = {"target_path": request.target_path, "unzip": "false"}
-            response = requests.post(f"{self._api_url}/upload", files=files, data=data, headers=self._headers)
+            with source.open("rb") as f:
+                response = await self._get_client().post(
+                    f"{self._api_url}/upload", files={"file": f}, data=data, headers=self._headers
+                )
             self._handle_response_errors(response)
-            return UploadResponse(**response.json())
+            return UploadResponse.model_validate_json(response.content)
         else:
             msg = f"Source path {source} is not a file or directory"
             raise ValueError(msg)
 
     async def close(self) -> CloseResponse:
         """Closes the runtime."""
-        return self._request("close", None, CloseResponse)
+        self._alive_until = 0.0
+        try:
+            return await self._request("close", None, CloseResponse)
+        finally:
+            await self._close_client()
@@ -6,11 +6,13 @@ import tempfile
 import traceback
 import zipfile
 from pathlib import Path
+from typing import Annotated
 
-from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.exception_handlers import http_exception_handler
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import APIKeyHeader
+from pydantic import TypeAdapter
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from swerex import __version__
@@ -20,6 +22,7 @@ from swerex.runtime.abstract import (
     CloseSessionRequest,
     Command,
     CreateSessionRequest,
+    Observation,
     ReadFileRequest,
     UploadResponse,
     WriteFileRequest,
@@ -27,15 +30,39 @@ from swerex.runtime.abstract import (
 )
 from swerex.runtime.local import LocalRuntime
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 app = FastAPI()
 runtime = LocalRuntime()
 
 AUTH_TOKEN = ""
 api_key_header = APIKeyHeader(name="X-API-Key")
 
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def _accepts_msgpack(accept: str | None) -> bool:
+    """Whether the client asked for msgpack (only possible if the `msgpack` extra is installed)."""
+    return msgpack is not None and accept is not None and MSGPACK_MEDIA_TYPE in accept
+
+
+def serialize_model(model, accept: str | None = None) -> Response:
+    """Serialize the model to JSON bytes in pydantic-core rather than returning a dict
+    that FastAPI would have to encode again with the stdlib `json` module.
+    This matters because observations can contain large command outputs.
+
+    If the client accepts msgpack, we send that instead: Strings are length-prefixed
+    there, so large outputs don't need to be escaped.
+    """
+    if _accepts_msgpack(accept):
+        return Response(content=msgpack.packb(model.model_dump(mode="json")), media_type=MSGPACK_MEDIA_TYPE)  # type: ignore
+    return Response(content=model.model_dump_json(), media_type="application/json")
 
-def serialize_model(model):
-    return model.model_dump() if hasattr(model, "model_dump") else model.dict()
+
+_observations_adapter = TypeAdapter(list[Observation])
 
 
 @app.middleware("http")
@@ -70,39 +97,54 @@ async def root():
     return {"message": "hello world"}
 
 
+@app.api_route("/healthz", methods=["GET", "HEAD"])
+async def healthz():
+    """Cheap liveness probe: No body, so there's nothing to serialize or parse."""
+    return Response(status_code=204)
+
+
 @app.get("/is_alive")
 async def is_alive():
     return serialize_model(await runtime.is_alive())
 
 
 @app.post("/create_session")
-async def create_session(request: CreateSessionRequest):
-    return serialize_model(await runtime.create_session(request))
+async def create_session(request: CreateSessionRequest, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.create_session(request), accept)
 
 
 @app.post("/run_in_session")
-async def run(action: Action):
-    return serialize_model(await runtime.run_in_session(action))
+async def run(action: Action, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.run_in_session(action), accept)
+
+
+@app.post("/run_in_session_batch")
+async def run_batch(actions: list[Action], accept: Annotated[str | None, Header()] = None):
+    observations = await runtime.run_in_session_batch(actions)
+    if _accepts_msgpack(accept):
+        content = msgpack.packb(_observations_adapter.dump_python(observations, mode="json"))  # type: ignore
+        return Response(content=content, media_type=MSGPACK_MEDIA_TYPE)
+    return Response(content=_observations_adapter.dump_json(observations), media_type="application/json")
 
 
 @app.post("/close_session")
-async def close_session(request: CloseSessionRequest):
-    return serialize_model(await runtime.close_session(request))
+async def close_session(request: CloseSessionRequest, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.close_session(request), accept)
 
 
 @app.post("/execute")
-async def execute(command: Command):
-    return serialize_model(await runtime.execute(command))
+async def execute(command: Command, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.execute(command), accept)
 
 
 @app.post("/read_file")
-async def read_file(request: ReadFileRequest):
-    return serialize_model(await runtime.read_file(request))
+async def read_file(request: ReadFileRequest, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.read_file(request), accept)
 
 
 @app.post("/write_file")
-async def write_file(request: WriteFileRequest):
-    return serialize_model(await runtime.write_file(request))
+async def write_file(request: WriteFileRequest, accept: Annotated[str | None, Header()] = None):
+    return serialize_model(await runtime.write_file(request), accept)
 
 
 @app.post("/upload")
@@ -127,13 +169,13 @@ async def upload(
             file_path.unlink()
         else:
             shutil.move(file_path, target_path)
-    return UploadResponse()
+    return serialize_model(UploadResponse())
 
 
 @app.post("/close")
 async def close():
     await runtime.close()
-    return CloseResponse()
+    return serialize_model(CloseResponse())
 
 
 def main():
@@ -156,11 +198,17 @@ def main():
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind the server to")
     parser.add_argument("--port", type=int, default=8000, help="Port to run the server on")
     parser.add_argument("--auth-token", default="", help="token to authenticate requests", required=True)
+    parser.add_argument(
+        "--uds", default=None, help="Bind to this unix domain socket instead of host and port (for local clients)"
+    )
 
     args = parser.parse_args(remaining_args)
     global AUTH_TOKEN
     AUTH_TOKEN = args.auth_token
-    uvicorn.run(app, host=args.host, port=args.port)
+    # Keep idle connections open for longer than the client's keep-alive expiry (uvicorn's default is 5s),
+    # so that clients can reuse their connection between actions.
+    # loop="auto" uses uvloop if it is installed (it's a dependency everywhere but on Windows).
+    uvicorn.run(app, host=args.host, port=args.port, uds=args.uds, timeout_keep_alive=75, loop="auto")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,33 @@
+import concurrent.futures
+import functools
 import hashlib
 import json
+import re
+import threading
+from typing import Any
 from urllib.parse import quote
 
 import boto3
+from botocore.config import Config
+
+_CLIENT_CONFIG = Config(
+    # Concurrent deployments call AWS from many threads at once; the default pool only has 10 connections
+    max_pool_connections=50,
+    # Back off on throttling rather than failing the deployment
+    retries={"mode": "adaptive", "max_attempts": 10},
+    tcp_keepalive=True,
+)
+_client_lock = threading.Lock()
+"""Creating clients from the default boto3 session is not thread-safe, but using the clients is."""
+
+
+@functools.cache
+def get_client(service: str) -> Any:
+    """Returns a boto3 client for the service. Creating a client is slow (it loads the service model and
+    resolves endpoints), so we create one per service and reuse it (clients are thread-safe).
+    """
+    with _client_lock:
+        return boto3.client(service, config=_CLIENT_CONFIG)
 
 
 def get_name_hash(prefix: str, obj: dict, max_length: int = 128, hash_length: int = 12) -> str:
@@ -13,15 +38,22 @@ def get_name_hash(prefix: str, obj: dict, max_length: int = 128, hash_length: in
     return f"{prefix}-{hashlib.sha256(json.dumps(obj).encode()).hexdigest()[:hash_length]}"
 
 
+_CONTAINER_NAME_INVALID_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
+"""ECS container names may only contain letters, numbers, hyphens and underscores."""
+
+
+@functools.cache
 def get_container_name(image_name: str) -> str:
-    image_name_sanitized = "".join(c for c in image_name if c.isalnum() or c in "-_")
+    image_name_sanitized = _CONTAINER_NAME_INVALID_CHARS.sub("", image_name)
     if len(image_name_sanitized) <= 255:
         return image_name_sanitized
-    return hashlib.sha256(image_name_sanitized.encode()).hexdigest()[:255]
+    # Only needs to be unique, not secure. blake2b is faster than sha256 and gives a shorter name.
+    return hashlib.blake2b(image_name_sanitized.encode(), digest_size=16).hexdigest()
 
 
+@functools.cache
 def get_execution_role_arn(execution_role_prefix: str) -> str:
-    iam_client = boto3.client("iam")
+    iam_client = get_client("iam")
 
     trust_relationship = {
         "Version": "2012-10-17",
@@ -66,30 +98,38 @@ def get_execution_role_arn(execution_role_prefix: str) -> str:
             MaxSessionDuration=3600,
             Tags=[{"Key": "origin", "Value": "swe-rex-deployment-auto"}],
         )
-    # check if policies already attached
-    attached_policies = iam_client.list_attached_role_policies(RoleName=role_name)
-    attached_policy_arns = [policy["PolicyArn"] for policy in attached_policies["AttachedPolicies"]]
-
-    if "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy" not in attached_policy_arns:
-        iam_client.attach_role_policy(
-            RoleName=role_name, PolicyArn="arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy"
-        )
-    if "arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly" not in attached_policy_arns:
-        iam_client.attach_role_policy(
-            RoleName=role_name, PolicyArn="arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly"
-        )
-
-    policy_names = iam_client.list_role_policies(RoleName=role_name)["PolicyNames"]
-    if "LogsAndSecretsPolicy" not in policy_names:
-        # Add inline policy
-        iam_client.put_role_policy(
-            RoleName=role_name, PolicyName="LogsAndSecretsPolicy", PolicyDocument=json.dumps(inline_policy)
-        )
+    # The IAM calls below are independent of each other, so we make them concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        attached_policies_future = executor.submit(iam_client.list_attached_role_policies, RoleName=role_name)
+        policy_names_future = executor.submit(iam_client.list_role_policies, RoleName=role_name)
+        attached_policy_arns = [policy["PolicyArn"] for policy in attached_policies_future.result()["AttachedPolicies"]]
+        policy_names = policy_names_future.result()["PolicyNames"]
+
+        futures = []
+        for policy_arn in [
+            "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy",
+            "arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly",
+        ]:
+            if policy_arn not in attached_policy_arns:
+                futures.append(executor.submit(iam_client.attach_role_policy, RoleName=role_name, PolicyArn=policy_arn))
+        if "LogsAndSecretsPolicy" not in policy_names:
+            # Add inline policy
+            futures.append(
+                executor.submit(
+                    iam_client.put_role_policy,
+                    RoleName=role_name,
+                    PolicyName="LogsAndSecretsPolicy",
+                    PolicyDocument=json.dumps(inline_policy),
+                )
+            )
+        for future in futures:
+            future.result()
     waiter = iam_client.get_waiter("role_exists")
     waiter.wait(RoleName=role_name)
     return role["Role"]["Arn"]
 
 
+@functools.cache
 def get_task_definition(
     image_name: str,
     port: int,
@@ -97,7 +137,7 @@ def get_task_definition(
     task_definition_prefix: str,
     log_group: str | None = None,
 ) -> str:
-    ecs_client = boto3.client("ecs")
+    ecs_client = get_client("ecs")
     task_definition = {
         "executionRoleArn": execution_role_arn,
         "networkMode": "awsvpc",
@@ -143,8 +183,9 @@ def get_task_definition(
     return response["taskDefinition"]
 
 
+@functools.cache
 def get_cluster_arn(cluster_name: str) -> str:
-    ecs_client = boto3.client("ecs")
+    ecs_client = get_client("ecs")
     response = ecs_client.create_cluster(
         clusterName=cluster_name,
         tags=[{"key": "origin", "value": "swe-rex-deployment-auto"}],
@@ -152,8 +193,9 @@ def get_cluster_arn(cluster_name: str) -> str:
     return response["cluster"]["clusterArn"]
 
 
+@functools.cache
 def get_default_vpc_and_subnet() -> tuple[str, str]:
-    ec2_client = boto3.client("ec2")
+    ec2_client = get_client("ec2")
     vpcs = ec2_client.describe_vpcs(Filters=[{"Name": "isDefault", "Values": ["true"]}])
     if not vpcs["Vpcs"]:
         msg = "No default VPC found"
@@ -167,8 +209,9 @@ def get_default_vpc_and_subnet() -> tuple[str, str]:
     return vpc_id, subnet_id
 
 
+@functools.cache
 def get_security_group(vpc_id: str, port: int, security_group_prefix: str) -> str:
-    ec2_client = boto3.client("ec2")
+    ec2_client = get_client("ec2")
     inbound_rule = {"IpProtocol": "tcp", "FromPort": port, "ToPort": port, "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}
     # if it exists, just return the id
     security_group_name = get_name_hash(security_group_prefix, inbound_rule, max_length=255)
@@ -240,7 +283,7 @@ def run_fargate_task(
     if overrides:
         run_task_args["overrides"] = overrides
 
-    ecs_client = boto3.client("ecs")
+    ecs_client = get_client("ecs")
     response = ecs_client.run_task(
         **run_task_args,
         tags=[{"key": "origin", "value": "swe-rex-deployment-auto"}],
@@ -249,10 +292,31 @@ def run_fargate_task(
 
 
 def get_public_ip(task_arn: str, cluster_arn: str) -> str:
-    ecs_client = boto3.client("ecs")
+    ecs_client = get_client("ecs")
     task_details = ecs_client.describe_tasks(cluster=cluster_arn, tasks=[task_arn])
-    eni_id = task_details["tasks"][0]["attachments"][0]["details"][1]["value"]
-    ec2_client = boto3.client("ec2")
+    return get_task_public_ip(task_details["tasks"][0])
+
+
+def get_task_network_interface_id(task: dict) -> str | None:
+    """Returns the ID of the network interface of a task from its `describe_tasks` entry, or None if the
+    network interface is not attached yet.
+    """
+    for attachment in task.get("attachments", []):
+        if attachment["type"] != "ElasticNetworkInterface" or attachment["status"] != "ATTACHED":
+            continue
+        for detail in attachment["details"]:
+            if detail["name"] == "networkInterfaceId":
+                return detail["value"]
+    return None
+
+
+def get_task_public_ip(task: dict) -> str:
+    """Returns the public IP of a task from its `describe_tasks` entry, saving the call to describe it again."""
+    eni_id = get_task_network_interface_id(task)
+    if eni_id is None:
+        msg = f"Network interface of task {task['taskArn']} is not attached"
+        raise RuntimeError(msg)
+    ec2_client = get_client("ec2")
     eni_details = ec2_client.describe_network_interfaces(NetworkInterfaceIds=[eni_id])
     return eni_details["NetworkInterfaces"][0]["Association"]["PublicIp"]
 
@@ -1,30 +1,59 @@
+import asyncio
+import random
 import time
 from collections.abc import Callable
 
+_JITTER = 0.2
+"""Relative random variation of the time between attempts, so that deployments that are started at the same time
+do not all poll in lockstep.
+"""
+
 
 async def _wait_until_alive(
-    function: Callable, timeout: float = 10.0, function_timeout: float | None = 0.1, sleep: float = 0.25
+    function: Callable,
+    timeout: float = 10.0,
+    function_timeout: float | None = 0.1,
+    sleep: float = 0.25,
+    *,
+    wake: asyncio.Event | None = None,
 ):
     """Wait until the function returns a truthy value.
 
+    The first attempt is made immediately. After that, the time between attempts starts at 10ms and doubles
+    after every failed attempt up to `sleep` (each varied randomly by up to 20%), so that fast starts are noticed
+    quickly without polling slow starts too often.
+
     Args:
         function: The function to wait for.
         timeout: The maximum time to wait.
         function_timeout: The timeout passed to the function.
-        sleep: The time to sleep between attempts.
+        sleep: The maximum time to sleep between attempts.
+        wake: If this event is set (e.g., because we learned that the server is up), we try again right away
+            instead of sleeping until the next attempt.
 
     Raises:
         TimeoutError
     """
-    end_time = time.time() + timeout
+    end_time = time.monotonic() + timeout
     n_attempts = 0
     await_response = None
-    while time.time() < end_time:
+    delay = min(0.01, sleep)
+    while time.monotonic() < end_time:
         await_response = await function(timeout=function_timeout)
+        n_attempts += 1
         if await_response:
             return
-        time.sleep(sleep)
-        n_attempts += 1
+        pause = min(delay * random.uniform(1 - _JITTER, 1 + _JITTER), max(0.0, end_time - time.monotonic()))
+        delay = min(delay * 2, sleep)
+        if wake is not None and not wake.is_set():
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=pause)
+            except asyncio.TimeoutError:
+                continue
+            # Woken up: try right away and poll quickly from now on
+            delay = min(0.01, sleep)
+        else:
+            await asyncio.sleep(pause)
     last_response_message = await_response.message if await_response else None
     msg = (
         f"Runtime did not start within {timeout}s (tried to connect {n_attempts} times). "
@@ -14,6 +14,7 @@ from swerex.runtime.abstract import (
     CloseBashSessionRequest,
     Command,
     CreateBashSessionRequest,
+    IsAliveResponse,
 )
 from swerex.runtime.remote import RemoteRuntime
 from swerex.utils.free_port import find_free_port
@@ -68,6 +69,21 @@ def runtime_with_default_session(remote_runtime: RemoteRuntime) -> Generator[Rem
     asyncio.run(remote_runtime.close_session(CloseBashSessionRequest()))
 
 
+class _DeadRuntime:
+    """Stands in for the runtime of a deployment whose server does not respond."""
+
+    async def is_alive(self, *, timeout: float | None = None, use_cache: bool = True) -> IsAliveResponse:
+        return IsAliveResponse(is_alive=False, message="connection refused")
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def dead_runtime() -> _DeadRuntime:
+    return _DeadRuntime()
+
+
 class _Action(BashAction):
     timeout: float | None = 5
 
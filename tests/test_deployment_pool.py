@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import swerex.deployment.pool
+from swerex.deployment.config import DockerDeploymentConfig, DummyDeploymentConfig, LocalDeploymentConfig
+from swerex.deployment.dummy import DummyDeployment
+from swerex.deployment.pool import DeploymentPool
+from swerex.runtime.abstract import Command
+
+
+async def test_deployment_pool():
+    async with DeploymentPool(LocalDeploymentConfig(), size=2) as pool:
+        d1 = await pool.acquire()
+        d2 = await pool.acquire()
+        assert d1 is not d2
+        assert await d1.is_alive()
+        r = await d1.runtime.execute(Command(command="echo hello", shell=True))
+        assert r.stdout.strip() == "hello"
+        await d1.stop()
+        await d2.stop()
+    with pytest.raises(RuntimeError):
+        await pool.acquire()
+
+
+def test_deployment_pool_rejects_fixed_port():
+    with pytest.raises(ValueError):
+        DeploymentPool(DockerDeploymentConfig(port=8000))
+
+
+async def test_deployment_pool_stops_deployments_that_are_still_starting(monkeypatch):
+    started = asyncio.Event()
+    stopped = []
+
+    class _SlowDeployment(DummyDeployment):
+        async def start(self):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def stop(self):
+            stopped.append(self)
+
+    monkeypatch.setattr(swerex.deployment.pool, "get_deployment", lambda config: _SlowDeployment())
+    async with DeploymentPool(DummyDeploymentConfig()):
+        await started.wait()
+    assert len(stopped) == 1
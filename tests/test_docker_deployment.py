@@ -1,7 +1,14 @@
+import subprocess
+import time
+
+import httpx
 import pytest
 
+import swerex.deployment.docker
 from swerex.deployment.config import DockerDeploymentConfig
 from swerex.deployment.docker import DockerDeployment
+from swerex.runtime.abstract import CommandResponse
+from swerex.runtime.remote import RemoteRuntime
 from swerex.utils.free_port import find_free_port
 
 
@@ -41,3 +48,219 @@ def test_docker_deployment_config_platform():
         config = DockerDeploymentConfig(platform="linux/amd64", docker_args=["--platform", "linux/amd64"])
     with pytest.raises(ValueError):
         config = DockerDeploymentConfig(platform="linux/amd64", docker_args=["--platform=linux/amd64"])
+
+
+class _DockerCLI:
+    """Records the arguments of `docker` commands instead of running them. Commands that start with one of the
+    keys of `outputs` print the value, all other commands fail.
+    """
+
+    def __init__(self, outputs: dict[tuple[str, ...], bytes] | None = None):
+        self.outputs = outputs or {}
+        self.calls: list[tuple[str, ...]] = []
+
+    async def __call__(self, *args: str, **kwargs) -> bytes:
+        self.calls.append(args)
+        for prefix, output in self.outputs.items():
+            if args[: len(prefix)] == prefix:
+                return output
+        raise subprocess.CalledProcessError(1, ["docker", *args], b"", b"Error: No such container")
+
+
+@pytest.fixture
+def no_docker_api(monkeypatch):
+    async def _docker_api_request(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", _docker_api_request)
+
+
+async def test_docker_deployment_reports_output_of_removed_container(monkeypatch, no_docker_api, dead_runtime):
+    """With `--rm`, a container that exits right away is gone before we can ask docker for its output."""
+
+    async def _wait_for_server_started(container, output):
+        output.extend([b"boom\n", b"python3: not found\n"])
+
+    async def _get_container_state(container):
+        return None
+
+    async def _wait_for_container_exit(container):
+        return None
+
+    monkeypatch.setattr(swerex.deployment.docker, "_wait_for_server_started", _wait_for_server_started)
+    monkeypatch.setattr(swerex.deployment.docker, "_get_container_state", _get_container_state)
+    monkeypatch.setattr(swerex.deployment.docker, "_wait_for_container_exit", _wait_for_container_exit)
+    docker_cli = _DockerCLI()
+    monkeypatch.setattr(swerex.deployment.docker, "_run_docker_command", docker_cli)
+    d = DockerDeployment(image="python:3.11")
+    d._runtime = dead_runtime
+    d._container_name = "python3.11-test"
+    d._container_id = "cid"
+    with pytest.raises(RuntimeError, match=r"exit code: unknown\)\.\nOutput:\nboom\npython3: not found"):
+        await d._wait_until_alive(timeout=5)
+    assert docker_cli.calls == [("rm", "-f", "cid")]
+    assert d._container_id is None
+
+
+async def test_docker_deployment_is_alive_bypasses_runtime_cache(monkeypatch):
+    """A container that died right after a successful `is_alive` is not reported alive."""
+
+    async def _get_container_state(container):
+        return None
+
+    monkeypatch.setattr(swerex.deployment.docker, "_get_container_state", _get_container_state)
+    d = DockerDeployment(image="python:3.11")
+    d._runtime = RemoteRuntime(port=find_free_port(), auth_token="")
+    d._runtime._alive_until = time.monotonic() + 60
+    d._container_name = "python3.11-test"
+    d._container_id = "cid"
+    with pytest.raises(RuntimeError, match="terminated and was removed"):
+        await d.is_alive()
+
+
+class _RuntimeWithoutSwerex:
+    async def execute(self, command) -> CommandResponse:
+        # `command -v swerex-remote` fails because swe-rex was installed with pipx on startup
+        return CommandResponse(exit_code=1)
+
+
+async def test_docker_deployment_cache_swerex_install(monkeypatch, no_docker_api):
+    monkeypatch.setattr(swerex.deployment.docker, "_image_available_cache", {})
+    image_id = b"sha256:aaaa\n"
+    docker_cli = _DockerCLI({("image", "inspect"): image_id, ("commit",): b""})
+    monkeypatch.setattr(swerex.deployment.docker, "_run_docker_command", docker_cli)
+
+    async def _prepare_and_cache() -> str | None:
+        d = DockerDeployment(image="python:3.11", pull="never", cache_swerex_install=True)
+        await d.prepare()
+        d._runtime = _RuntimeWithoutSwerex()
+        d._container_name = "python3.11-test"
+        if d._image_id != d._warm_image_tag:
+            await d._cache_swerex_install()
+        d._runtime = None
+        d._container_name = None
+        return d._image_id
+
+    # No warm image yet: start from the image and commit the container
+    assert await _prepare_and_cache() == "python:3.11"
+    commits = [call for call in docker_cli.calls if call[0] == "commit"]
+    assert len(commits) == 1
+    warm_tag = commits[0][2]
+    assert warm_tag.startswith("swerex-warm:")
+    # Next time, the warm image is used
+    assert await _prepare_and_cache() == warm_tag
+    # After the image was pulled again under the same name, the stale warm image is not used
+    docker_cli.outputs[("image", "inspect")] = b"sha256:bbbb\n"
+    assert await _prepare_and_cache() == "python:3.11"
+    new_commits = [call for call in docker_cli.calls if call[0] == "commit"]
+    assert len(new_commits) == 2
+    assert new_commits[1][2] != warm_tag
+
+
+class _DockerAPI:
+    """Records requests to the docker engine API and answers them from `responses`, which maps
+    (method, path) to (status code, JSON body).
+    """
+
+    def __init__(self, responses: dict[tuple[str, str], tuple[int, object]]):
+        self.responses = responses
+        self.requests: list[tuple[str, str, dict | None, object]] = []
+
+    async def __call__(self, method: str, path: str, *, timeout=30, params=None, body=None) -> httpx.Response | None:
+        self.requests.append((method, path, params, body))
+        if (method, path) not in self.responses:
+            return None
+        status_code, json = self.responses[(method, path)]
+        return httpx.Response(status_code, json=json)
+
+
+async def test_run_container_via_api(monkeypatch):
+    docker_api = _DockerAPI(
+        {
+            ("POST", "/containers/create"): (201, {"Id": "cid"}),
+            ("POST", "/containers/cid/start"): (204, None),
+        }
+    )
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", docker_api)
+    container_id = await swerex.deployment.docker._run_container_via_api(
+        "name", "python:3.11", ["swerex-remote"], None, "linux/amd64", auto_remove=True
+    )
+    assert container_id == "cid"
+    method, path, params, body = docker_api.requests[0]
+    assert params == {"name": "name", "platform": "linux/amd64"}
+    assert body["Image"] == "python:3.11"
+    assert body["Cmd"] == ["swerex-remote"]
+    assert body["HostConfig"] == {"PortBindings": {"8000/tcp": [{"HostPort": ""}]}, "AutoRemove": True}
+
+
+async def test_run_container_via_api_falls_back_if_image_is_missing(monkeypatch):
+    docker_api = _DockerAPI({("POST", "/containers/create"): (404, {"message": "No such image"})})
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", docker_api)
+    assert (
+        await swerex.deployment.docker._run_container_via_api(
+            "name", "python:3.11", ["swerex-remote"], 8000, None, auto_remove=True
+        )
+        is None
+    )
+
+
+async def test_run_container_via_api_removes_container_that_does_not_start(monkeypatch):
+    docker_api = _DockerAPI(
+        {
+            ("POST", "/containers/create"): (201, {"Id": "cid"}),
+            ("POST", "/containers/cid/start"): (500, {"message": "port is already allocated"}),
+            ("DELETE", "/containers/cid"): (204, None),
+        }
+    )
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", docker_api)
+    with pytest.raises(RuntimeError, match="port is already allocated"):
+        await swerex.deployment.docker._run_container_via_api(
+            "name", "python:3.11", ["swerex-remote"], 8000, None, auto_remove=True
+        )
+    assert docker_api.requests[-1][:3] == ("DELETE", "/containers/cid", {"force": "true"})
+
+
+async def test_docker_deployment_host_port(monkeypatch):
+    docker_api = _DockerAPI(
+        {("GET", "/containers/cid/json"): (200, {"NetworkSettings": {"Ports": {"8000/tcp": [{"HostPort": "32768"}]}}})}
+    )
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", docker_api)
+    d = DockerDeployment(image="python:3.11")
+    d._container_id = "cid"
+    assert await d._get_host_port() == 32768
+    # Without the API, we ask the docker CLI
+    docker_api.responses.clear()
+    docker_cli = _DockerCLI({("port",): b"0.0.0.0:32769\n[::]:32769\n"})
+    monkeypatch.setattr(swerex.deployment.docker, "_run_docker_command", docker_cli)
+    assert await d._get_host_port() == 32769
+    assert docker_cli.calls == [("port", "cid", "8000/tcp")]
+    d._container_id = None
+
+
+@pytest.mark.parametrize(
+    ("remove_container", "api_request", "cli_command"),
+    [(True, ("DELETE", "/containers/cid"), ("rm", "-f")), (False, ("POST", "/containers/cid/kill"), ("kill",))],
+)
+async def test_docker_deployment_stop(monkeypatch, remove_container, api_request, cli_command):
+    docker_api = _DockerAPI({api_request: (204, None)})
+    monkeypatch.setattr(swerex.deployment.docker, "_docker_api_request", docker_api)
+    docker_cli = _DockerCLI({cli_command: b"cid"})
+    monkeypatch.setattr(swerex.deployment.docker, "_run_docker_command", docker_cli)
+    for api_status_code, expected_cli_calls in [
+        (204, []),
+        (500, [(*cli_command, "cid")]),
+        (None, [(*cli_command, "cid")]),
+    ]:
+        if api_status_code is None:
+            docker_api.responses.clear()
+        else:
+            docker_api.responses[api_request] = (api_status_code, None)
+        docker_cli.calls.clear()
+        d = DockerDeployment(image="python:3.11", remove_container=remove_container)
+        d._container_name = "name"
+        d._container_id = "cid"
+        await d.stop()
+        assert docker_api.requests[-1][:2] == api_request
+        # The CLI is only used if the API is not reachable or fails
+        assert docker_cli.calls == expected_cli_calls
+        assert d._container_id is None
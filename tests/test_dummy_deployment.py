@@ -1,3 +1,6 @@
+import threading
+
+from swerex.deployment.abstract import stop_all
 from swerex.deployment.dummy import DummyDeployment
 from swerex.runtime.abstract import BashAction, CloseBashSessionRequest, CreateBashSessionRequest
 
@@ -11,3 +14,30 @@ async def test_dummy_deployment():
     await deployment.runtime.close_session(CloseBashSessionRequest())
     assert await deployment.is_alive()
     await deployment.stop()
+
+
+def test_dummy_deployment_stopped_when_deleted_outside_event_loop():
+    stopped = threading.Event()
+
+    class _Deployment(DummyDeployment):
+        async def stop(self):
+            stopped.set()
+
+    deployment = _Deployment()
+    del deployment
+    assert stopped.wait(timeout=5)
+
+
+async def test_stop_all():
+    stopped = []
+
+    class _Deployment(DummyDeployment):
+        async def stop(self):
+            stopped.append(self)
+            if len(stopped) == 1:
+                msg = "first stop fails"
+                raise RuntimeError(msg)
+
+    deployments = [_Deployment() for _ in range(3)]
+    await stop_all(deployments)
+    assert len(stopped) == 3
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from pathlib import Path
 
 import pytest
@@ -18,6 +19,7 @@ from swerex.runtime.abstract import (
     WriteFileRequest,
 )
 from swerex.runtime.remote import RemoteRuntime
+from swerex.utils.free_port import find_free_port
 
 from .conftest import _Action as A
 from .conftest import _Command as C
@@ -32,6 +34,15 @@ async def test_server_dead():
     assert not await r.is_alive()
 
 
+async def test_server_dead_within_is_alive_cache():
+    r = RemoteRuntime(port=find_free_port(), auth_token="")
+    # As if the server had answered just before it died
+    r._alive_until = time.monotonic() + 60
+    assert await r.is_alive()
+    assert not await r.is_alive(use_cache=False)
+    assert not await r.is_alive()
+
+
 async def test_read_write_file(remote_runtime: RemoteRuntime, tmp_path: Path):
     path = tmp_path / "test.txt"
     await remote_runtime.write_file(WriteFileRequest(path=str(path), content="test"))
@@ -208,6 +219,21 @@ async def test_bash_multiline_command_eof(runtime_with_default_session: RemoteRu
     assert "hello world 2" in r.output
 
 
+async def test_run_in_session_batch(runtime_with_default_session: RemoteRuntime):
+    rs = await runtime_with_default_session.run_in_session_batch(
+        [A(command="cd /tmp"), A(command="pwd"), A(command="false", check="silent")]
+    )
+    assert [r.exit_code for r in rs] == [0, 0, 1]
+    assert rs[1].output == "/tmp"
+
+
+async def test_run_in_session_batch_stops_at_error(runtime_with_default_session: RemoteRuntime):
+    with pytest.raises(NonZeroExitCodeError):
+        await runtime_with_default_session.run_in_session_batch([A(command="false"), A(command="export NOT_RUN=1")])
+    r = await runtime_with_default_session.run_in_session(A(command="echo ${NOT_RUN:-unset}"))
+    assert r.output == "unset"
+
+
 async def test_run_in_shell_subshell_command(runtime_with_default_session: RemoteRuntime):
     await runtime_with_default_session.run_in_session(A(command="(sleep 10) &", check="raise"))
 
@@ -307,6 +333,16 @@ async def test_interrupt_session(runtime_with_default_session: RemoteRuntime):
     assert r.output == "asdf"
 
 
+async def test_interrupt_command_that_ignores_sigint(runtime_with_default_session: RemoteRuntime):
+    with pytest.raises(CommandTimeoutError):
+        await runtime_with_default_session.run_in_session(A(command="bash -c \"trap '' INT; sleep 30\"", timeout=0.1))
+    # Ctrl-C is ignored, so this falls back to suspending and killing the job
+    r = await runtime_with_default_session.run_in_session(BashInterruptAction(n_retry=1))
+    assert "EXITCODESTART" not in r.output
+    r = await runtime_with_default_session.run_in_session(A(command="echo 'asdf'", check="raise"))
+    assert "asdf" in r.output
+
+
 async def test_interrupt_pager(runtime_with_default_session: RemoteRuntime):
     with pytest.raises(CommandTimeoutError):
         # -+F to force less to start
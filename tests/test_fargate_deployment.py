@@ -1,8 +1,10 @@
+import asyncio
 import os
 
 import pytest
 
-from swerex.deployment.fargate import FargateDeployment
+import swerex.deployment.fargate
+from swerex.deployment.fargate import FargateDeployment, _get_task_describer, _is_running
 
 
 @pytest.mark.cloud
@@ -35,3 +37,135 @@ async def test_fargate_deployment_ubuntu_base():
     await d.start()
     assert await d.is_alive()
     await d.stop()
+
+
+class _FakeECSClient:
+    """Answers `describe_tasks` from a dict of task ARN -> last status."""
+
+    def __init__(self, statuses: dict[str, str]):
+        self.statuses = statuses
+        self.calls: list[list[str]] = []
+        self.stopped: list[str] = []
+
+    def describe_tasks(self, *, cluster: str, tasks: list[str]) -> dict:
+        self.calls.append(tasks)
+        return {
+            "tasks": [
+                {"taskArn": arn, "lastStatus": self.statuses[arn], "stoppedReason": "test"}
+                for arn in tasks
+                if arn in self.statuses
+            ],
+            "failures": [{"arn": arn, "reason": "MISSING"} for arn in tasks if arn not in self.statuses],
+        }
+
+    def stop_task(self, *, task: str, cluster: str) -> dict:
+        self.stopped.append(task)
+        return {}
+
+
+@pytest.fixture
+def fake_ecs(monkeypatch):
+    def _fake_ecs(client) -> None:
+        monkeypatch.setattr(swerex.deployment.fargate, "get_client", lambda service: client)
+        monkeypatch.setattr(swerex.deployment.fargate, "_TASK_DESCRIBE_WINDOW", 0.01)
+        monkeypatch.setattr(swerex.deployment.fargate, "_TASK_POLL_INTERVAL", 0.02)
+
+    return _fake_ecs
+
+
+async def test_task_describer_batches_requests(fake_ecs):
+    client = _FakeECSClient({f"task{i}": "PENDING" for i in range(150)})
+    fake_ecs(client)
+    describer = _get_task_describer()
+    waiters = [asyncio.create_task(describer.wait_until("cluster", f"task{i}", _is_running)) for i in range(150)]
+    await asyncio.sleep(0.1)
+    assert not any(waiter.done() for waiter in waiters)
+    # At most 100 tasks per call
+    assert all(len(tasks) <= 100 for tasks in client.calls)
+    client.statuses.update({f"task{i}": "RUNNING" for i in range(150)})
+    n_calls = len(client.calls)
+    tasks = await asyncio.gather(*waiters)
+    assert [task["taskArn"] for task in tasks] == [f"task{i}" for i in range(150)]
+    # One poll (two calls) unless a poll was already running when the statuses changed
+    assert len(client.calls) - n_calls <= 4
+
+
+async def test_task_describer_failures_and_stopped(fake_ecs):
+    fake_ecs(_FakeECSClient({"running": "RUNNING", "stopped": "STOPPED"}))
+    describer = _get_task_describer()
+    assert (await describer.describe("cluster", "stopped"))["lastStatus"] == "STOPPED"
+    with pytest.raises(RuntimeError, match="stopped before it was running"):
+        await describer.wait_until("cluster", "stopped", _is_running)
+    with pytest.raises(RuntimeError, match="MISSING"):
+        await describer.describe("cluster", "missing")
+    assert (await describer.wait_until("cluster", "running", _is_running))["lastStatus"] == "RUNNING"
+
+
+async def test_task_describer_fails_pending_requests_when_poller_crashes(fake_ecs):
+    class _MalformedECSClient(_FakeECSClient):
+        def describe_tasks(self, *, cluster: str, tasks: list[str]) -> dict:
+            return {"tasks": [{}], "failures": []}
+
+    fake_ecs(_MalformedECSClient({}))
+    describer = _get_task_describer()
+    with pytest.raises(RuntimeError, match="Failed to describe ECS tasks"):
+        await asyncio.wait_for(describer.wait_until("cluster", "task", _is_running), 5)
+    # The poller is restarted for new requests
+    fake_ecs(_FakeECSClient({"task": "RUNNING"}))
+    assert (await asyncio.wait_for(describer.describe("cluster", "task"), 5))["lastStatus"] == "RUNNING"
+
+
+async def test_task_describer_fails_pending_requests_without_client(fake_ecs, monkeypatch):
+    def _get_client(service: str):
+        msg = "You must specify a region."
+        raise ValueError(msg)
+
+    fake_ecs(None)
+    monkeypatch.setattr(swerex.deployment.fargate, "get_client", _get_client)
+    with pytest.raises(RuntimeError, match="You must specify a region"):
+        await asyncio.wait_for(_get_task_describer().describe("cluster", "task"), 5)
+
+
+@pytest.fixture
+async def started_deployment(fake_ecs, dead_runtime):
+    """A `FargateDeployment` with a task on the fake ECS whose runtime does not respond.
+    The deployment is stopped against the fake ECS afterwards.
+    """
+    client = _FakeECSClient({})
+    fake_ecs(client)
+    d = FargateDeployment(image="python:3.11")
+    d._runtime = dead_runtime
+    d._task_arn = "task"
+    d._cluster_arn = "cluster"
+    yield d
+    await d.stop()
+    assert client.stopped == ["task"]
+
+
+async def test_is_alive_raises_if_task_status_does_not_arrive(started_deployment, monkeypatch):
+    # ECS answers, but never with our task
+    monkeypatch.setattr(_FakeECSClient, "describe_tasks", lambda self, cluster, tasks: {"tasks": [], "failures": []})
+    monkeypatch.setattr(swerex.deployment.fargate, "_TASK_DESCRIBE_TIMEOUT", 0.1)
+    with pytest.raises(RuntimeError, match="Failed to get the status of task"):
+        await started_deployment.is_alive()
+
+
+async def test_public_ip_falls_back_to_running_task(monkeypatch):
+    monkeypatch.setattr(swerex.deployment.fargate, "_PUBLIC_IP_TIMEOUT", 0.1)
+    monkeypatch.setattr(swerex.deployment.fargate, "get_task_public_ip", lambda task: task["ip"])
+    d = FargateDeployment(image="python:3.11")
+    # The network interface is never reported as attached
+    never_attached = asyncio.create_task(asyncio.sleep(3600))
+    assert await d._get_public_ip(never_attached, {"ip": "1.2.3.4"}) == "1.2.3.4"
+    assert never_attached.cancelled()
+
+    async def _failing_lookup():
+        msg = "no network interface"
+        raise RuntimeError(msg)
+
+    assert await d._get_public_ip(asyncio.create_task(_failing_lookup()), {"ip": "1.2.3.4"}) == "1.2.3.4"
+
+    async def _early_lookup():
+        return "5.6.7.8"
+
+    assert await d._get_public_ip(asyncio.create_task(_early_lookup()), {"ip": "1.2.3.4"}) == "5.6.7.8"
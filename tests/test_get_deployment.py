@@ -7,6 +7,7 @@ from swerex.deployment.config import (
     LocalDeploymentConfig,
     ModalDeploymentConfig,
     RemoteDeploymentConfig,
+    parse_deployment_config,
 )
 from swerex.deployment.docker import DockerDeployment
 from swerex.deployment.fargate import FargateDeployment
@@ -40,5 +41,13 @@ def test_get_fargate_deployment():
     assert isinstance(deployment, FargateDeployment)
 
 
+def test_parse_deployment_config():
+    config = parse_deployment_config({"type": "docker", "image": "test"})
+    assert isinstance(config, DockerDeploymentConfig)
+    assert config.image == "test"
+    with pytest.raises(ValueError):
+        parse_deployment_config({"type": "local", "image": "test"})
+
+
 if __name__ == "__main__":
     pytest.main()
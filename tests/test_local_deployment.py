@@ -8,3 +8,9 @@ async def test_local_deployment():
     assert await d.is_alive()
     await d.stop()
     assert not await d.is_alive()
+
+
+async def test_local_deployment_context_manager():
+    async with LocalDeployment() as d:
+        assert await d.is_alive()
+    assert not await d.is_alive()
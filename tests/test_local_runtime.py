@@ -1,8 +1,10 @@
+import asyncio
+import os
 from pathlib import Path
 
 import pytest
 
-from swerex.runtime.abstract import ReadFileRequest, UploadRequest
+from swerex.runtime.abstract import Command, ReadFileRequest, UploadRequest
 from swerex.runtime.local import LocalRuntime
 
 
@@ -28,3 +30,20 @@ async def test_upload_directory(local_runtime: LocalRuntime, tmp_path: Path):
     await local_runtime.upload(UploadRequest(source_path=str(dir_path), target_path=str(tmp_target)))
     assert (await local_runtime.read_file(ReadFileRequest(path=str(tmp_target / "file1.txt")))).content == "test1"
     assert (await local_runtime.read_file(ReadFileRequest(path=str(tmp_target / "file2.txt")))).content == "test2"
+
+
+async def test_execute_kills_command_when_cancelled(local_runtime: LocalRuntime, tmp_path: Path):
+    pid_file = tmp_path / "pid"
+    task = asyncio.create_task(
+        local_runtime.execute(Command(command=f"echo $$ > {pid_file}; exec sleep 30", shell=True))
+    )
+    for _ in range(50):
+        if pid_file.exists() and pid_file.read_text().strip():
+            break
+        await asyncio.sleep(0.1)
+    pid = int(pid_file.read_text())
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
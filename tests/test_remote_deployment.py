@@ -1,5 +1,11 @@
+import asyncio
+import threading
+import time
+
 import pytest
+import uvicorn
 
+import swerex.server
 from swerex.deployment.remote import RemoteDeployment
 from swerex.exceptions import DeploymentNotStartedError
 from tests.conftest import TEST_API_KEY
@@ -14,3 +20,72 @@ async def test_remote_deployment(remote_server):
     await d.start()
     assert await d.is_alive()
     await d.stop()
+
+
+class _StopRecordingDeployment(RemoteDeployment):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stopped = threading.Event()
+        self.errors = []
+
+    async def stop(self):
+        try:
+            await super().stop()
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.stopped.set()
+
+
+async def _use(deployment: RemoteDeployment):
+    await deployment.start()
+    assert await deployment.is_alive()
+
+
+@pytest.mark.parametrize("loop_running", [False, True])
+def test_remote_deployment_stopped_when_deleted_outside_event_loop(remote_server, loop_running):
+    """`__del__` stops the deployment on a cleanup loop that differs from the loop the
+    runtime's HTTP client was opened in.
+    """
+    d = _StopRecordingDeployment(port=remote_server.port, auth_token=TEST_API_KEY)
+    stopped, errors = d.stopped, d.errors
+    if loop_running:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(_use(d), loop).result(timeout=10)
+    else:
+        asyncio.run(_use(d))
+    client = d.runtime._client
+    assert client is not None
+    del d
+    assert stopped.wait(timeout=10)
+    assert errors == []
+    if loop_running:
+        # The client is closed in its own loop rather than awaited on the cleanup loop
+        for _ in range(50):
+            if client.is_closed:
+                break
+            time.sleep(0.1)
+        assert client.is_closed
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def test_remote_deployment_unix_domain_socket(tmp_path):
+    socket_path = tmp_path / "swerex.sock"
+    swerex.server.AUTH_TOKEN = TEST_API_KEY
+    server = uvicorn.Server(uvicorn.Config(swerex.server.app, uds=str(socket_path), log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    for _ in range(50):
+        if socket_path.exists():
+            break
+        time.sleep(0.1)
+    d = RemoteDeployment(host=f"unix://{socket_path}", auth_token=TEST_API_KEY)
+    await d.start()
+    assert await d.is_alive()
+    await d.stop()
+    server.should_exit = True
+    thread.join()
@@ -1,3 +1,4 @@
+import pytest
 import requests
 
 from tests.conftest import RemoteServer
@@ -11,6 +12,23 @@ def test_is_alive(remote_server: RemoteServer):
     assert response.json()["is_alive"]
 
 
+def test_healthz(remote_server: RemoteServer):
+    response = requests.head(f"http://127.0.0.1:{remote_server.port}/healthz", headers=remote_server.headers)
+    assert response.status_code == 204
+    assert not response.content
+
+
+def test_msgpack_response(remote_server: RemoteServer):
+    msgpack = pytest.importorskip("msgpack")
+    response = requests.post(
+        f"http://127.0.0.1:{remote_server.port}/execute",
+        json={"command": "echo hello", "shell": True},
+        headers={**remote_server.headers, "Accept": "application/msgpack"},
+    )
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["stdout"] == "hello\n"
+
+
 def test_hello_world(remote_server: RemoteServer):
     assert (
         requests.get(f"http://127.0.0.1:{remote_server.port}/", headers=remote_server.headers).json()["message"]